@@ -0,0 +1,102 @@
+"""
+Columnar msgpack format for bulk match requests.
+
+A request is a msgpack map::
+
+    {
+        "version": 1,
+        "n": <number of pairs>,
+        "candidate": {<column name>: <column>, ...},
+        "job": {<column name>: <column>, ...}
+    }
+
+Columns hold one value per pair. Numeric columns (`years_experience`,
+`education_level`, `location_match`, `embedding`) are typed arrays, encoded as
+{"dtype": <numpy dtype string, e.g. "<f4">, "shape": [...], "data": <raw bytes>}
+and decoded without copying. `education_level` may also be a list of level
+names, `text` is a list of strings, `skills` a list of string lists and `id`
+a list of profile IDs to look up in an index instead of sending features.
+See `HybridMatcher.prepare_features_columns` for how the columns are used.
+
+The response is {"version": 1, "n": ..., "score": <float32 typed array>}.
+"""
+from typing import Dict, Tuple
+
+import msgpack
+import numpy as np
+
+CONTENT_TYPE = 'application/x-msgpack'
+FORMAT_VERSION = 1
+
+
+def encode_array(array: np.ndarray) -> Dict:
+    array = np.ascontiguousarray(array)
+    return {'dtype': array.dtype.str, 'shape': list(array.shape), 'data': array.tobytes()}
+
+
+def decode_array(obj: Dict) -> np.ndarray:
+    dtype = np.dtype(obj['dtype'])
+    # Only plain numeric data; never let a request choose an object dtype
+    if dtype.kind not in 'biuf':
+        raise ValueError(f"Unsupported array dtype: {obj['dtype']}")
+    return np.frombuffer(obj['data'], dtype=dtype).reshape(obj['shape'])
+
+
+def _decode_side(side: Dict, n_pairs: int, name: str) -> Dict:
+    if not isinstance(side, dict):
+        raise ValueError(f"'{name}' must be a map of columns")
+    columns = {}
+    for column, value in side.items():
+        if isinstance(value, dict):
+            value = decode_array(value)
+        if not hasattr(value, '__len__') or getattr(value, 'ndim', 1) == 0:
+            raise ValueError(f"Column '{name}.{column}' must be a list or typed array")
+        if len(value) != n_pairs:
+            raise ValueError(f"Column '{name}.{column}' has {len(value)} values, expected {n_pairs}")
+        columns[column] = value
+    return columns
+
+
+def decode_bulk_request(body: bytes) -> Tuple[int, Dict, Dict]:
+    """Decode a bulk request into (number of pairs, candidate columns, job columns)"""
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid msgpack payload: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Bulk request must be a msgpack map")
+    if payload.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bulk format version: {payload.get('version')}")
+
+    n_pairs = int(payload['n'])
+    candidate = _decode_side(payload.get('candidate', {}), n_pairs, 'candidate')
+    job = _decode_side(payload.get('job', {}), n_pairs, 'job')
+    return n_pairs, candidate, job
+
+
+def encode_bulk_request(n_pairs: int, candidate: Dict, job: Dict) -> bytes:
+    """Encode columns into a bulk request; numpy arrays become typed arrays"""
+    def _encode_side(side: Dict) -> Dict:
+        return {
+            column: encode_array(value) if isinstance(value, np.ndarray) else value
+            for column, value in side.items()
+        }
+
+    return msgpack.packb({
+        'version': FORMAT_VERSION,
+        'n': n_pairs,
+        'candidate': _encode_side(candidate),
+        'job': _encode_side(job),
+    }, use_bin_type=True)
+
+
+def encode_bulk_response(scores: np.ndarray) -> bytes:
+    return msgpack.packb({
+        'version': FORMAT_VERSION,
+        'n': len(scores),
+        'score': encode_array(np.asarray(scores, dtype=np.float32)),
+    }, use_bin_type=True)
+
+
+def decode_bulk_response(body: bytes) -> np.ndarray:
+    return decode_array(msgpack.unpackb(body, raw=False)['score'])
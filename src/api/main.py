@@ -1,18 +1,214 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List
+import asyncio
+import gc
+import hashlib
+import hmac
 import joblib
+import json
+import logging
 import os
+import threading
+from ..models.coalescing import SingleFlight
 from ..models.hybrid_matcher import HybridMatcher
+from ..models.pipeline import StagedPipeline, parse_concurrency
+from ..models.profile_index import ProfileIndex
+from ..models.shared_arrays import SharedArrayStore, file_cache_key, file_signature, memory_usage, watch_file
+from .bulk_format import CONTENT_TYPE, decode_bulk_request, encode_bulk_response
+from .model_manager import ModelManager
 
 app = FastAPI()
+logger = logging.getLogger("uvicorn.error")
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes')
 
 # Load the trained model
 model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'hybrid_model.joblib')
+# Models can only be (re)loaded from this directory
+model_dir = os.path.dirname(os.path.realpath(model_path))
+model_manager = ModelManager(shadow_sample_rate=float(os.environ.get('SHADOW_SAMPLE_RATE', '0.1')))
+model_key = None
 try:
-    matcher = HybridMatcher.load(model_path)
+    # Taken before loading so shared arrays are never keyed by a newer version of the file
+    model_key = file_cache_key(model_path)
+    model_manager.active = HybridMatcher.load(model_path)
+    model_manager.active_path = model_path
 except FileNotFoundError:
-    matcher = None
+    pass
+
+# Concurrent requests for the same pair, or the same resume/job text, share one computation
+pair_flight = SingleFlight()
+text_flight = SingleFlight()
+
+def _active_matcher() -> HybridMatcher:
+    matcher = model_manager.active
+    if matcher is not None and matcher.processor.single_flight is None:
+        matcher.processor.single_flight = text_flight
+    return matcher
+
+def _pair_key(matcher: HybridMatcher, candidate: Dict[str, Any], job: Dict[str, Any]) -> str:
+    payload = json.dumps({'candidate': candidate, 'job': job}, sort_keys=True, default=str)
+    # Results are only shared between requests served by the same model
+    return f"{id(matcher)}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+# Optionally run /match through the staged parse/encode/score pipeline, so that
+# concurrent requests overlap in different stages instead of each running all of them
+pipeline = None
+pipeline_loop = None
+if _env_flag('PIPELINE'):
+    pipeline = StagedPipeline(
+        concurrency=parse_concurrency(os.environ.get('PIPELINE_CONCURRENCY', '')),
+        queue_size=int(os.environ.get('PIPELINE_QUEUE_SIZE', '4'))
+    )
+
+@app.on_event("startup")
+async def start_pipeline():
+    global pipeline_loop
+    if pipeline is not None:
+        pipeline_loop = asyncio.get_running_loop()
+        await pipeline.start()
+
+@app.on_event("shutdown")
+async def stop_pipeline():
+    if pipeline is not None:
+        await pipeline.stop()
+
+def _score_pair(matcher: HybridMatcher, candidate: Dict[str, Any], job: Dict[str, Any]):
+    if pipeline is not None and pipeline.running:
+        # Called from a threadpool thread: hand the pair to the pipeline on the event loop
+        return asyncio.run_coroutine_threadsafe(
+            pipeline.submit(matcher, [candidate], [job], explain=True), pipeline_loop
+        ).result()
+    features = matcher.prepare_features(candidate, job)
+    score, explanation = matcher.predict_from_features(features)
+    return features, score, explanation
+
+# Number of API worker processes; uvicorn and gunicorn both read WEB_CONCURRENCY
+api_workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+# Index of open job postings for reverse (candidate -> jobs) matching
+job_index_path = os.path.join(os.path.dirname(model_path), 'job_index.joblib')
+job_index = None
+# Signature of job_index.joblib when this worker last loaded or saved it
+job_index_signature = None
+job_index_key = None
+
+def _get_job_index() -> ProfileIndex:
+    global job_index, job_index_signature, job_index_key
+    matcher = _active_matcher()
+    if job_index is None and matcher is not None:
+        # The index only depends on the NLP models, which are shared across hot-swaps
+        processor = matcher.processor
+        job_index_signature = file_signature(job_index_path)
+        if job_index_signature is not None:
+            job_index_key = file_cache_key(job_index_path)
+            job_index = ProfileIndex.load(job_index_path, processor=processor)
+        else:
+            job_index = ProfileIndex(processor)
+    return job_index
+
+def _check_job_writes() -> None:
+    # Every worker holds its own copy of the index, so a write handled by one
+    # worker would never reach the others
+    if api_workers > 1 or _env_flag('SHARED_ARRAYS'):
+        raise HTTPException(
+            status_code=409,
+            detail="Job postings are read-only with several workers; update them with update_profiles.py"
+        )
+    # A reload from disk would silently drop writes made here
+    if _env_flag('JOB_INDEX_WATCH'):
+        raise HTTPException(
+            status_code=409,
+            detail="Job postings are read-only while job_index.joblib is watched; update them with update_profiles.py"
+        )
+
+def _save_job_index(index: ProfileIndex) -> None:
+    global job_index_signature
+    index.save(job_index_path)
+    job_index_signature = file_signature(job_index_path)
+
+_get_job_index()
+
+# Optionally map the forest and job embeddings from files shared by all workers
+memory_report = {'before_sharing': memory_usage()}
+array_store = None
+if _env_flag('SHARED_ARRAYS'):
+    array_store = model_manager.array_store = SharedArrayStore(os.environ.get('SHARED_ARRAYS_DIR'))
+    # Only share what still matches the files on disk
+    if model_manager.active is not None and os.path.exists(model_path) and file_cache_key(model_path) == model_key:
+        model_manager.active.share_arrays(array_store, model_key)
+    if job_index_key is not None and os.path.exists(job_index_path) and file_cache_key(job_index_path) == job_index_key:
+        job_index.share(array_store, job_index_key)
+    # Drop arrays left behind by earlier versions of these files
+    array_store.prune(os.path.basename(model_path) + '-', keep=[model_key] if model_key else [])
+    array_store.prune(os.path.basename(job_index_path) + '-', keep=[job_index_key] if job_index_key else [])
+    gc.collect()
+    memory_report['after_sharing'] = memory_usage()
+    logger.info(
+        "Worker %d memory before/after sharing arrays: RSS %.1f/%.1f MiB, PSS %.1f/%.1f MiB",
+        os.getpid(),
+        memory_report['before_sharing']['rss'] / 2**20,
+        memory_report['after_sharing']['rss'] / 2**20,
+        memory_report['before_sharing'].get('pss', 0) / 2**20,
+        memory_report['after_sharing'].get('pss', 0) / 2**20
+    )
+    # /match explanations use a SHAP explainer, which copies the forest into
+    # private arrays in every worker. Build it now, as the first /match would,
+    # so the report shows what a worker holds once it serves requests
+    if model_manager.active is not None and model_manager.active.prepare_explainer():
+        gc.collect()
+        memory_report['after_explainer'] = memory_usage()
+        logger.info(
+            "Worker %d memory with the SHAP explainer's private forest copy: RSS %.1f MiB, PSS %.1f MiB",
+            os.getpid(),
+            memory_report['after_explainer']['rss'] / 2**20,
+            memory_report['after_explainer'].get('pss', 0) / 2**20
+        )
+
+# Optionally pick up retrained models as they are written to disk
+if _env_flag('MODEL_WATCH'):
+    model_manager.watch(
+        model_path,
+        interval=float(os.environ.get('MODEL_WATCH_INTERVAL', '5')),
+        promote=_env_flag('MODEL_WATCH_PROMOTE')
+    )
+
+def _reload_job_index() -> None:
+    """Swap in job_index.joblib as last written by update_profiles.py"""
+    global job_index, job_index_signature, job_index_key
+    matcher = _active_matcher()
+    if matcher is None:
+        return
+    try:
+        signature = file_signature(job_index_path)
+        key = file_cache_key(job_index_path)
+        index = ProfileIndex.load(job_index_path, processor=matcher.processor)
+        if file_signature(job_index_path) != signature:
+            # Rewritten while loading; the watcher picks up the newer file
+            return
+        if array_store is not None:
+            index.share(array_store, key)
+    except Exception:
+        logger.exception("Failed to reload %s; keeping the current job index", job_index_path)
+        return
+
+    previous_key = job_index_key
+    # Requests that already picked up the old index finish on it
+    job_index, job_index_signature, job_index_key = index, signature, key
+    if array_store is not None and previous_key not in (None, key):
+        array_store.release(previous_key)
+    logger.info("Reloaded %s with %d open jobs", job_index_path, len(index))
+
+# Optionally pick up job postings written by update_profiles.py
+job_index_watch_stop = threading.Event()
+if _env_flag('JOB_INDEX_WATCH'):
+    watch_file(
+        job_index_path, _reload_job_index, job_index_watch_stop,
+        interval=float(os.environ.get('JOB_INDEX_WATCH_INTERVAL', '5'))
+    )
 
 class MatchRequest(BaseModel):
     candidate: Dict[str, Any]
@@ -23,13 +219,59 @@ class MatchResponse(BaseModel):
     feature_importance: Dict[str, float]
     feature_contribution: Dict[str, float] = None
 
+class JobPosting(BaseModel):
+    structured: Dict[str, Any] = {}
+    unstructured: str = ''
+
+class RecommendJobsRequest(BaseModel):
+    candidate: Dict[str, Any]
+    top_k: int = 10
+
+class JobRecommendation(BaseModel):
+    job_id: str
+    score: float
+
+class RecommendJobsResponse(BaseModel):
+    recommendations: List[JobRecommendation]
+
+class ModelLoadRequest(BaseModel):
+    path: str = None
+    promote: bool = False
+    shadow_sample_rate: float = Field(None, ge=0.0, le=1.0)
+
+def _check_admin_token(token: str) -> None:
+    expected = os.environ.get('ADMIN_TOKEN')
+    # Without a configured token the admin endpoints are off rather than open
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if token is None or not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _resolve_model_path(path: str) -> str:
+    """Resolve a requested model file, which must be a .joblib file inside `model_dir`"""
+    if path is None:
+        return model_path
+    # Loading runs joblib.load (i.e. unpickles), so never accept files from elsewhere
+    resolved = os.path.realpath(os.path.join(model_dir, path))
+    if os.path.commonpath([resolved, model_dir]) != model_dir or not resolved.endswith('.joblib'):
+        raise HTTPException(status_code=400, detail=f"Models must be .joblib files in {model_dir}")
+    return resolved
+
 @app.post("/match", response_model=MatchResponse)
-async def match_candidate_job(request: MatchRequest):
+async def match_candidate_job(request: MatchRequest, background_tasks: BackgroundTasks):
+    # Take one reference so a concurrent hot-swap cannot change the model mid-request
+    matcher = _active_matcher()
     if matcher is None:
         raise HTTPException(status_code=500, detail="Model not loaded. Please train the model first.")
-    
+
     try:
-        score, explanation = matcher.predict_score(request.candidate, request.job)
+        features, score, explanation = await run_in_threadpool(
+            pair_flight.do,
+            _pair_key(matcher, request.candidate, request.job),
+            _score_pair, matcher, request.candidate, request.job
+        )
+        if model_manager.should_shadow():
+            background_tasks.add_task(model_manager.shadow_score, features, request.candidate, request.job)
         return MatchResponse(
             score=score,
             feature_importance=explanation['feature_importance'],
@@ -38,6 +280,141 @@ async def match_candidate_job(request: MatchRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _score_bulk(matcher: HybridMatcher, body: bytes) -> bytes:
+    n_pairs, candidate, job = decode_bulk_request(body)
+    if 'id' in candidate:
+        raise ValueError("Candidate IDs are not supported; send candidate columns instead")
+    if 'id' in job:
+        index = _get_job_index()
+        job_ids = job.pop('id')
+        missing = [job_id for job_id in job_ids if job_id not in index]
+        if missing:
+            raise ValueError(f"Unknown job IDs: {missing[:10]}")
+        job.update(index.gather(job_ids))
+    features = matcher.prepare_features_columns(n_pairs, candidate, job)
+    return encode_bulk_response(matcher.predict_features(features))
+
+@app.post("/match/bulk")
+async def match_bulk(request: Request):
+    """Score many pairs sent in the columnar msgpack format of `bulk_format`"""
+    matcher = _active_matcher()
+    if matcher is None:
+        raise HTTPException(status_code=500, detail="Model not loaded. Please train the model first.")
+
+    body = await request.body()
+    try:
+        content = await run_in_threadpool(_score_bulk, matcher, body)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=content, media_type=CONTENT_TYPE)
+
+@app.post("/recommend_jobs", response_model=RecommendJobsResponse)
+async def recommend_jobs(request: RecommendJobsRequest):
+    matcher = _active_matcher()
+    index = _get_job_index()
+    if matcher is None or index is None:
+        raise HTTPException(status_code=500, detail="Model not loaded. Please train the model first.")
+
+    try:
+        recommendations = await run_in_threadpool(
+            matcher.recommend_jobs, request.candidate, index, top_k=request.top_k
+        )
+        return RecommendJobsResponse(recommendations=recommendations)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/jobs/{job_id}")
+async def upsert_job(job_id: str, posting: JobPosting, x_admin_token: str = Header(None)):
+    _check_admin_token(x_admin_token)
+    _check_job_writes()
+    index = _get_job_index()
+    if index is None:
+        raise HTTPException(status_code=500, detail="Model not loaded. Please train the model first.")
+    # Featurizing runs spaCy and the sentence transformer; keep it off the event loop
+    await run_in_threadpool(
+        index.upsert, job_id, {'structured': posting.structured, 'unstructured': posting.unstructured}
+    )
+    return {"job_id": job_id, "open_jobs": len(index)}
+
+@app.delete("/jobs/{job_id}")
+async def close_job(job_id: str, x_admin_token: str = Header(None)):
+    _check_admin_token(x_admin_token)
+    _check_job_writes()
+    index = _get_job_index()
+    if index is None or not index.remove(job_id):
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return {"job_id": job_id, "open_jobs": len(index)}
+
+@app.post("/admin/jobs/save")
+async def save_job_index(x_admin_token: str = Header(None)):
+    _check_admin_token(x_admin_token)
+    # When update_profiles.py owns the file, saving here could overwrite its newer version
+    _check_job_writes()
+    index = _get_job_index()
+    if index is None:
+        raise HTTPException(status_code=500, detail="Model not loaded. Please train the model first.")
+    _save_job_index(index)
+    return {"path": job_index_path, "open_jobs": len(index)}
+
+@app.on_event("shutdown")
+def persist_job_index():
+    if job_index is None or not job_index.dirty:
+        return
+    if file_signature(job_index_path) != job_index_signature:
+        # Someone else (e.g. update_profiles.py) wrote the file since we read it:
+        # keep their version and set ours aside instead of overwriting it
+        unsaved_path = f"{job_index_path}.{os.getpid()}.unsaved"
+        logger.warning("%s changed on disk; saving this worker's job index to %s", job_index_path, unsaved_path)
+        job_index.save(unsaved_path)
+        return
+    _save_job_index(job_index)
+
+@app.get("/admin/model")
+async def model_status(x_admin_token: str = Header(None)):
+    _check_admin_token(x_admin_token)
+    return model_manager.status()
+
+@app.post("/admin/model/load", status_code=202)
+async def load_model(request: ModelLoadRequest, x_admin_token: str = Header(None)):
+    _check_admin_token(x_admin_token)
+    path = _resolve_model_path(request.path)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {path}")
+    if request.shadow_sample_rate is not None:
+        model_manager.shadow_sample_rate = request.shadow_sample_rate
+    model_manager.load_candidate(path, promote=request.promote)
+    return {"status": "loading", "path": path, "promote": request.promote}
+
+@app.post("/admin/model/promote")
+async def promote_model(x_admin_token: str = Header(None)):
+    _check_admin_token(x_admin_token)
+    if not model_manager.promote():
+        raise HTTPException(status_code=409, detail="No candidate model loaded")
+    return model_manager.status()
+
+@app.delete("/admin/model/candidate")
+async def discard_candidate_model(x_admin_token: str = Header(None)):
+    _check_admin_token(x_admin_token)
+    model_manager.discard_candidate()
+    return model_manager.status()
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "coalescing": {
+            "pair": pair_flight.stats(),
+            "text": text_flight.stats()
+        },
+        "pipeline": pipeline.stats() if pipeline is not None else None,
+        "memory": {
+            "pid": os.getpid(),
+            "current": memory_usage(),
+            **memory_report
+        }
+    }
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "model_loaded": matcher is not None} 
\ No newline at end of file
+    return {"status": "healthy", "model_loaded": model_manager.active is not None}
@@ -0,0 +1,239 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+from ..models.hybrid_matcher import HybridMatcher
+from ..models.shared_arrays import file_cache_key, watch_file
+
+
+class ModelManager:
+    """Holds the serving model plus an optional candidate model for hot-swaps.
+
+    Candidate forests are loaded in a background thread and share the NLP
+    models of the active matcher, so only the joblib file is read. Promotion is
+    a single reference assignment: requests that already picked up the old
+    matcher finish on it, new requests see the new one.
+    """
+
+    def __init__(self, active: Optional[HybridMatcher] = None, shadow_sample_rate: float = 0.0):
+        if not 0.0 <= shadow_sample_rate <= 1.0:
+            raise ValueError(f"shadow_sample_rate must be between 0 and 1, got {shadow_sample_rate}")
+        self.active = active
+        self.active_path = None
+        self.candidate = None
+        self.candidate_path = None
+        self.shadow_sample_rate = shadow_sample_rate
+        self.loading_path = None
+        self.last_error = None
+        # When set, loaded forests are flattened into this SharedArrayStore
+        self.array_store = None
+        self._lock = threading.Lock()
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._reset_shadow_stats()
+
+    def _reset_shadow_stats(self, window: int = 1000) -> None:
+        self._shadow_count = 0
+        self._shadow_deltas = deque(maxlen=window)
+        self._shadow_latencies = deque(maxlen=window)
+        self._active_latencies = deque(maxlen=window)
+        # (active, candidate, whether the candidate can reuse the active model's
+        # features); reset on every swap so replaced models are not kept alive
+        self._feature_reuse = None
+
+    def load_candidate(self, path: str, promote: bool = False) -> threading.Thread:
+        """Load a forest from `path` in the background.
+
+        The loaded model either replaces the active one straight away
+        (`promote=True`) or becomes the shadow candidate.
+        """
+        thread = threading.Thread(
+            target=self._load_candidate, args=(path, promote), daemon=True
+        )
+        self.loading_path = path
+        thread.start()
+        return thread
+
+    def _load_candidate(self, path: str, promote: bool) -> None:
+        active = self.active
+        processor = active.processor if active is not None else None
+        try:
+            # Key the shared arrays by the file as it was before reading it, and
+            # refuse to share if it was rewritten meanwhile: the arrays must
+            # never be published under the key of a different version
+            key = file_cache_key(path)
+            candidate = HybridMatcher.load(path, processor=processor)
+            if self.array_store is not None:
+                if file_cache_key(path) != key:
+                    raise RuntimeError("file changed while it was being loaded")
+                candidate.share_arrays(self.array_store, key)
+        except Exception as e:
+            self.last_error = f"Failed to load {path}: {e}"
+            self.loading_path = None
+            return
+
+        with self._lock:
+            self.last_error = None
+            self.loading_path = None
+            replaced = [self.candidate]
+            if promote or self.active is None:
+                replaced.append(self.active)
+                self.active = candidate
+                self.active_path = path
+                self.candidate = None
+                self.candidate_path = None
+            else:
+                self.candidate = candidate
+                self.candidate_path = path
+            self._reset_shadow_stats()
+            self._release(replaced)
+
+    def promote(self) -> bool:
+        """Make the candidate the active model; returns False if there is none"""
+        with self._lock:
+            if self.candidate is None:
+                return False
+            replaced = [self.active]
+            self.active = self.candidate
+            self.active_path = self.candidate_path
+            self.candidate = None
+            self.candidate_path = None
+            self._reset_shadow_stats()
+            self._release(replaced)
+        return True
+
+    def discard_candidate(self) -> None:
+        """Drop the candidate model without promoting it"""
+        with self._lock:
+            replaced = [self.candidate]
+            self.candidate = None
+            self.candidate_path = None
+            self._reset_shadow_stats()
+            self._release(replaced)
+
+    def _release(self, matchers) -> None:
+        """Remove the shared arrays of models that are no longer active or candidate.
+
+        Requests still running on them keep their existing mappings.
+        """
+        if self.array_store is None:
+            return
+        in_use = {m.shared_key for m in (self.active, self.candidate) if m is not None}
+        for matcher in matchers:
+            key = getattr(matcher, 'shared_key', None)
+            if key is not None and key not in in_use:
+                self.array_store.release(key)
+
+    def should_shadow(self) -> bool:
+        """Decide whether the current request is sampled for shadow scoring"""
+        return self.candidate is not None and random.random() < self.shadow_sample_rate
+
+    def shadow_score(self, features: np.ndarray, candidate_data: Dict = None, job_data: Dict = None) -> None:
+        """Score features with both models and record latency and score delta.
+
+        `features` are laid out in the active model's schema. They are reused
+        (with the candidate's columns selected from them) only when the
+        candidate would compute the same values, i.e. its skill features use
+        the same taxonomy and weights; otherwise the candidate featurizes the
+        raw `candidate_data`/`job_data` itself, so score deltas reflect the
+        models rather than differences in featurization.
+        """
+        active, candidate = self.active, self.candidate
+        if active is None or candidate is None:
+            return
+
+        if self._reuses_features(active, candidate):
+            if candidate.schema.columns == active.schema.columns:
+                candidate_features = features
+            else:
+                candidate_features = candidate.schema.project(features, active.schema)
+        elif candidate_data is not None and job_data is not None:
+            candidate_features = candidate.prepare_features(candidate_data, job_data)
+        else:
+            return
+
+        start = time.perf_counter()
+        active_score = active.predict_features(features)[0]
+        active_latency = time.perf_counter() - start
+
+        start = time.perf_counter()
+        candidate_score = candidate.predict_features(candidate_features)[0]
+        shadow_latency = time.perf_counter() - start
+
+        with self._lock:
+            # The candidate may have been swapped while we were scoring
+            if candidate is not self.candidate:
+                return
+            self._shadow_count += 1
+            self._shadow_deltas.append(float(candidate_score - active_score))
+            self._active_latencies.append(active_latency)
+            self._shadow_latencies.append(shadow_latency)
+
+    def _reuses_features(self, active: HybridMatcher, candidate: HybridMatcher) -> bool:
+        """Whether the candidate can be scored on the active model's feature rows, cached per pair of models"""
+        cached = self._feature_reuse
+        if cached is not None and cached[0] is active and cached[1] is candidate:
+            return cached[2]
+        reuse = (set(candidate.schema.columns) <= set(active.schema.columns)
+                 and candidate.featurizes_like(active))
+        self._feature_reuse = (active, candidate, reuse)
+        return reuse
+
+    def shadow_stats(self) -> Dict:
+        """Summarise shadow scoring over the most recent sampled requests"""
+        with self._lock:
+            deltas = np.array(self._shadow_deltas)
+            shadow_latencies = np.array(self._shadow_latencies) * 1000
+            active_latencies = np.array(self._active_latencies) * 1000
+            count = self._shadow_count
+
+        if count == 0:
+            return {'count': 0}
+
+        def _summary(values: np.ndarray) -> Dict[str, float]:
+            return {
+                'mean': float(values.mean()),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'max': float(values.max()),
+            }
+
+        return {
+            'count': count,
+            'window': int(len(deltas)),
+            'score_delta_mean': float(deltas.mean()),
+            'score_delta_abs': _summary(np.abs(deltas)),
+            'active_latency_ms': _summary(active_latencies),
+            'shadow_latency_ms': _summary(shadow_latencies),
+        }
+
+    def status(self) -> Dict:
+        return {
+            'active_path': self.active_path,
+            'candidate_path': self.candidate_path,
+            'loading_path': self.loading_path,
+            'last_error': self.last_error,
+            'shadow_sample_rate': self.shadow_sample_rate,
+            'watching': self._watch_thread is not None and self._watch_thread.is_alive(),
+            'shadow': self.shadow_stats(),
+        }
+
+    def watch(self, path: str, interval: float = 5.0, promote: bool = False) -> None:
+        """Poll `path` and load it as a candidate whenever it changes.
+
+        A change is only acted on once the file is unchanged across two polls,
+        so a model that is still being written is not loaded.
+        """
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return
+        self._watch_stop.clear()
+        self._watch_thread = watch_file(
+            path, lambda: self.load_candidate(path, promote=promote), self._watch_stop, interval
+        )
+
+    def stop_watching(self) -> None:
+        self._watch_stop.set()
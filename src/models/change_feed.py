@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from .hybrid_matcher import MixedDataProcessor
+from .profile_index import ProfileIndex
+
+
+def hash_fields(data: Dict) -> Dict[str, str]:
+    """Hash the source fields of a profile: its structured data and its text"""
+    structured = json.dumps(data.get('structured', {}), sort_keys=True, default=str)
+    return {
+        'structured': hashlib.sha256(structured.encode('utf-8')).hexdigest(),
+        'unstructured': hashlib.sha256(data.get('unstructured', '').encode('utf-8')).hexdigest(),
+    }
+
+
+def iter_jsonl_events(path: str, follow: bool = False, poll_interval: float = 1.0) -> Iterator[Optional[Dict]]:
+    """Read change events from a JSONL file, one event per line.
+
+    With `follow=True` the file is tailed like a queue: once the end is
+    reached a `None` is yielded (which makes `ProfileChangeFeed.apply` flush
+    its pending batch) and new lines are picked up as they are appended.
+    """
+    with open(path) as f:
+        while True:
+            position = f.tell()
+            line = f.readline()
+            if line.endswith('\n') or (line and not follow):
+                if line.strip():
+                    yield json.loads(line)
+                continue
+            if not follow:
+                return
+            # Partial line still being written: re-read it once it is complete
+            f.seek(position)
+            yield None
+            time.sleep(poll_interval)
+
+
+class ProfileChangeFeed:
+    """Apply candidate/job change events to profile indexes, re-featurizing only what changed.
+
+    Events look like::
+
+        {"op": "upsert", "kind": "job", "id": "J001",
+         "data": {"structured": {...}, "unstructured": "..."}}
+        {"op": "delete", "kind": "candidate", "id": "C042"}
+
+    `kind` selects the index to update. The structured data and the text of
+    each profile are hashed separately and compared with the hashes stored in
+    the index: structured features are recomputed only when the structured
+    data changed, and skills and embeddings only when the text changed. An
+    upsert may omit either field to leave it as it is.
+
+    Events are applied in batches of `batch_size`; within a batch the latest
+    event per profile wins and all changed texts are processed together. A
+    `None` in the stream flushes the current batch early.
+    """
+
+    def __init__(self, processor: MixedDataProcessor, indexes: Dict[str, ProfileIndex],
+                 batch_size: int = 256, encode_batch_size: int = 64):
+        self.processor = processor
+        self.indexes = indexes
+        self.batch_size = batch_size
+        self.encode_batch_size = encode_batch_size
+        self.stats = {
+            'events': 0, 'batches': 0, 'upserts': 0, 'deletes': 0, 'unchanged': 0,
+            'structured_recomputed': 0, 'text_recomputed': 0,
+        }
+
+    def apply(self, events: Iterable[Optional[Dict]], on_flush: Callable[[Dict], None] = None,
+              on_idle: Callable[[], None] = None) -> Dict[str, int]:
+        """Consume `events` and return the accumulated statistics.
+        
+        `on_flush(stats)` is called after each applied batch and `on_idle()`
+        for every `None` in the stream, after any pending batch was flushed,
+        so a follower can act on time while no events arrive.
+        """
+        pending = {}
+        for event in events:
+            if event is not None:
+                self.stats['events'] += 1
+                self._merge(pending, event)
+            if pending and (event is None or len(pending) >= self.batch_size):
+                self._flush(pending)
+                pending = {}
+                if on_flush is not None:
+                    on_flush(self.stats)
+            if event is None and on_idle is not None:
+                on_idle()
+        if pending:
+            self._flush(pending)
+            if on_flush is not None:
+                on_flush(self.stats)
+        return self.stats
+
+    def _merge(self, pending: Dict, event: Dict) -> None:
+        if event['kind'] not in self.indexes:
+            raise ValueError(f"No index for profile kind: {event['kind']}")
+        if event['op'] not in ('upsert', 'delete'):
+            raise ValueError(f"Unknown event op: {event['op']}")
+
+        key = (event['kind'], event['id'])
+        previous = pending.get(key)
+        data = event.get('data', {})
+        if event['op'] == 'upsert' and previous is not None:
+            if previous['op'] == 'upsert':
+                # A later partial upsert only overrides the fields it carries
+                data = {**previous['data'], **data}
+                event = dict(event, recreate=previous.get('recreate', False))
+            else:
+                # Deleted and re-created within the batch: nothing carries over
+                event = dict(event, recreate=True)
+        pending[key] = dict(event, data=data)
+
+    def _flush(self, pending: Dict) -> None:
+        self.stats['batches'] += 1
+        updates = []
+        texts = {}
+
+        for (kind, profile_id), event in pending.items():
+            index = self.indexes[kind]
+            if event['op'] == 'delete':
+                if index.remove(profile_id):
+                    self.stats['deletes'] += 1
+                continue
+
+            data = event['data']
+            known = profile_id in index and not event.get('recreate', False)
+            previous = index.source_hashes.get(profile_id, {}) if known else {}
+            hashes = hash_fields(data)
+            changed = {}
+            for field in ('structured', 'unstructured'):
+                if known and field not in data:
+                    # Omitted fields keep their current version
+                    hashes[field] = previous.get(field)
+                    changed[field] = False
+                else:
+                    changed[field] = not known or hashes[field] != previous.get(field)
+
+            structured_changed, text_changed = changed['structured'], changed['unstructured']
+            if not structured_changed and not text_changed:
+                self.stats['unchanged'] += 1
+                continue
+
+            if text_changed:
+                texts.setdefault(data.get('unstructured', ''), len(texts))
+            updates.append((index, profile_id, data, hashes, structured_changed, text_changed))
+
+        infos, embeddings = self.processor.process_unstructured_batch(
+            list(texts), batch_size=self.encode_batch_size
+        ) if texts else ([], None)
+
+        for index, profile_id, data, hashes, structured_changed, text_changed in updates:
+            if profile_id in index:
+                structured, skills, embedding = index.get_features(profile_id)
+            if structured_changed:
+                structured = self.processor.process_structured_data(data.get('structured', {}))
+                self.stats['structured_recomputed'] += 1
+            if text_changed:
+                row = texts[data.get('unstructured', '')]
+                skills, embedding = infos[row]['skills'], embeddings[row]
+                self.stats['text_recomputed'] += 1
+            index.upsert_features(profile_id, structured, skills, embedding, source_hashes=hashes)
+            self.stats['upserts'] += 1
+
+
+def load_or_create_index(path: str, processor: MixedDataProcessor) -> ProfileIndex:
+    """Load a saved index if `path` exists, otherwise start an empty one"""
+    if path and os.path.exists(path):
+        return ProfileIndex.load(path, processor=processor)
+    return ProfileIndex(processor)
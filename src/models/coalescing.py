@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that compute the same result.
+
+    The first caller for a key runs the computation; callers that arrive with
+    the same key while it is still running wait for it and share its result
+    (or its exception). Nothing is cached once the computation finishes, so
+    this only removes duplicate work between overlapping requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` unless a call for `key` is already in flight"""
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def do_many(self, keys: List[Hashable], fn: Callable[[List[int]], List[Any]]) -> List[Any]:
+        """Like `do` for many keys at once, computing the missing ones in one call.
+
+        `fn(positions)` returns the results for those positions of `keys`
+        (e.g. one batch of texts) and only gets the keys with no call in
+        flight; the other keys wait for the calls that are already running.
+        Returns one result per key.
+        """
+        futures, leading = [], []
+        with self._lock:
+            for position, key in enumerate(keys):
+                self.calls += 1
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    leading.append(position)
+                else:
+                    self.deduplicated += 1
+                futures.append(future)
+
+        if leading:
+            try:
+                results = fn(leading)
+            except BaseException as e:
+                for position in leading:
+                    futures[position].set_exception(e)
+                raise
+            else:
+                for position, result in zip(leading, results):
+                    futures[position].set_result(result)
+            finally:
+                with self._lock:
+                    for position in leading:
+                        del self._in_flight[keys[position]]
+
+        # Every leading key was computed before waiting, so batches that wait
+        # on each other's keys cannot deadlock
+        return [future.result() for future in futures]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'deduplicated': self.deduplicated,
+                'dedup_rate': self.deduplicated / self.calls if self.calls else 0.0,
+                'in_flight': len(self._in_flight),
+            }
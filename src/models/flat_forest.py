@@ -0,0 +1,131 @@
+from typing import Dict
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+
+class FlatForest:
+    """A fitted RandomForestRegressor flattened into a few contiguous arrays.
+
+    The nodes of all trees are concatenated, with child indices pointing into
+    the concatenated arrays, so the whole forest is a handful of plain numpy
+    arrays. Those can be memory-mapped and shared read-only between processes,
+    unlike scikit-learn trees which copy their nodes into private memory when
+    unpickled. Predictions walk every tree for every row at once and match
+    `RandomForestRegressor.predict`.
+    """
+
+    # Upper bound on the (row, tree) pairs `predict` walks at once
+    chunk_nodes = 1 << 18
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+
+    @classmethod
+    def from_forest(cls, forest: RandomForestRegressor) -> 'FlatForest':
+        """Flatten a fitted single-output forest"""
+        children_left, children_right, feature, threshold = [], [], [], []
+        value, node_sample_weight, roots = [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            children_left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            children_right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            feature.append(tree.feature)
+            threshold.append(tree.threshold)
+            value.append(tree.value[:, 0, 0])
+            node_sample_weight.append(tree.weighted_n_node_samples)
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls({
+            'children_left': np.concatenate(children_left).astype(np.int64),
+            'children_right': np.concatenate(children_right).astype(np.int64),
+            'feature': np.concatenate(feature).astype(np.int64),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'value': np.concatenate(value).astype(np.float64),
+            'node_sample_weight': np.concatenate(node_sample_weight).astype(np.float64),
+            'roots': np.array(roots, dtype=np.int64),
+            'feature_importances': np.asarray(forest.feature_importances_, dtype=np.float64),
+        })
+
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        return self.arrays['feature_importances']
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.arrays['roots'])
+
+    def share(self, store, key: str) -> 'FlatForest':
+        """Move the arrays into a `SharedArrayStore` and use the shared copies"""
+        self.arrays = {name: store.publish(f"{key}.{name}", array) for name, array in self.arrays.items()}
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        """Average of the tree predictions, like `RandomForestRegressor.predict`.
+        
+        Rows are walked through all trees `chunk_nodes // n_estimators` at a
+        time, so the working memory stays bounded however many rows are scored.
+        """
+        # scikit-learn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        chunk_rows = max(1, self.chunk_nodes // self.n_estimators)
+        predictions = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_rows):
+            chunk = X[start:start + chunk_rows]
+            predictions[start:start + len(chunk)] = self._predict_chunk(chunk)
+        return predictions
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        left = self.arrays['children_left']
+        right = self.arrays['children_right']
+        feature = self.arrays['feature']
+        threshold = self.arrays['threshold']
+        n_estimators = self.n_estimators
+
+        # One current node per (row, tree) pair, row-major, so entry i belongs to row i // n_estimators
+        nodes = np.tile(self.arrays['roots'], len(X))
+        pending = np.flatnonzero(left[nodes] != -1)
+        while pending.size:
+            current = nodes[pending]
+            go_left = X[pending // n_estimators, feature[current]] <= threshold[current]
+            nodes[pending] = np.where(go_left, left[current], right[current])
+            pending = pending[left[nodes[pending]] != -1]
+
+        return self.arrays['value'][nodes].reshape(len(X), n_estimators).mean(axis=1)
+
+    def tree_explainer_model(self) -> Dict:
+        """Describe the forest in the dictionary format accepted by `shap.TreeExplainer`.
+        
+        Node arrays are passed as views of the (possibly shared) arrays, but SHAP
+        converts them into its own padded arrays, so every explainer holds a
+        private copy of the forest.
+        """
+        starts = self.arrays['roots']
+        ends = np.append(starts[1:], len(self.arrays['value']))
+        scale = 1.0 / self.n_estimators
+        trees = []
+        for start, end in zip(starts, ends):
+            left = np.where(self.arrays['children_left'][start:end] == -1, -1,
+                            self.arrays['children_left'][start:end] - start)
+            right = np.where(self.arrays['children_right'][start:end] == -1, -1,
+                             self.arrays['children_right'][start:end] - start)
+            trees.append({
+                'children_left': left,
+                'children_right': right,
+                'children_default': left,
+                'features': self.arrays['feature'][start:end],
+                'thresholds': self.arrays['threshold'][start:end],
+                'values': self.arrays['value'][start:end].reshape(-1, 1) * scale,
+                'node_sample_weight': self.arrays['node_sample_weight'][start:end],
+            })
+        return {
+            'trees': trees,
+            'base_offset': 0.0,
+            'tree_output': 'raw_value',
+            'objective': 'squared_error',
+            'input_dtype': np.float32,
+            'internal_dtype': np.float64,
+        }
@@ -1,21 +1,81 @@
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 from sentence_transformers import SentenceTransformer
 import spacy
 from spacy.matcher import PhraseMatcher
 import re
-from typing import Dict, List, Tuple, Union
+import time
+import hashlib
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
 import joblib
 
+from .skill_taxonomy import SkillTaxonomy, SkillWeights, skill_overlap_features, skill_overlap_one_to_many
+
+class FeatureSchema:
+    """Fixed column order and dtype of the feature matrix the random forest uses.
+    
+    Feature rows are written straight into preallocated arrays of this layout;
+    the column names are only needed to label explanations.
+    """
+    def __init__(self, columns: List[str], dtype=np.float32):
+        self.columns = tuple(columns)
+        self.dtype = np.dtype(dtype)
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        
+    def __len__(self) -> int:
+        return len(self.columns)
+        
+    def empty(self, n_rows: int) -> np.ndarray:
+        """Allocate an uninitialized feature matrix for `n_rows` pairs"""
+        return np.empty((n_rows, len(self.columns)), dtype=self.dtype)
+        
+    def fill(self, features: np.ndarray, values: Dict[str, Union[float, np.ndarray]]) -> np.ndarray:
+        """Write named feature values (scalars or one value per row) into their columns"""
+        for name, position in self.index.items():
+            features[:, position] = values[name]
+        return features
+        
+    def project(self, features: np.ndarray, source: 'FeatureSchema') -> np.ndarray:
+        """Select this schema's columns from features laid out in `source`"""
+        missing = [name for name in self.columns if name not in source.index]
+        if missing:
+            raise ValueError(f"Features are missing columns: {missing}")
+        return features[:, [source.index[name] for name in self.columns]]
+
+FEATURE_COLUMNS = [
+    'structured_similarity',
+    'semantic_similarity',
+    'tfidf_similarity',
+    'years_experience',
+    'education_level',
+    'location_match',
+    'skill_overlap',
+    'skill_jaccard',
+    'skill_weighted_coverage'
+]
+# Columns of models saved before the schema was stored with them
+LEGACY_FEATURE_COLUMNS = FEATURE_COLUMNS[:6]
+FEATURE_SCHEMA = FeatureSchema(FEATURE_COLUMNS)
+
+# Phrases after which skills are listed, e.g. "proficient in Python and SQL."
+SKILL_INDICATORS = ['proficient in', 'experience with', 'knowledge of', 'skilled in']
+
+# IDF weight of a term that occurs in only one document of a two-document corpus
+# (smooth_idf=True): ln((1 + 2) / (1 + 1)) + 1. Shared terms get ln(3 / 3) + 1 = 1.
+_PAIR_IDF_UNSHARED = np.log(1.5) + 1.0
+
 class MixedDataProcessor:
     def __init__(self):
         # Initialize components
         self.nlp = spacy.load('en_core_web_sm')
         self.sentence_transformer = SentenceTransformer('all-MiniLM-L6-v2')
         self.tfidf_vectorizer = TfidfVectorizer(max_features=1000)
+        # Optional SingleFlight that lets concurrent callers share the work for identical texts
+        self.single_flight = None
         
     def process_structured_data(self, data: Dict) -> Dict:
         """Process structured data (tables with defined columns)"""
@@ -28,36 +88,161 @@ class MixedDataProcessor:
         
     def process_unstructured_data(self, text: str) -> Tuple[Dict, np.ndarray]:
         """Process unstructured data (resumes, job descriptions)"""
+        if self.single_flight is not None:
+            return self.single_flight.do(self._text_key(text), self._process_unstructured_data, text)
+        return self._process_unstructured_data(text)
+        
+    @staticmethod
+    def _text_key(text: str, stage: str = '') -> str:
+        """`single_flight` key of a text; `stage` separates the batch stages' results"""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{stage}:{digest}" if stage else digest
+        
+    def _process_unstructured_data(self, text: str) -> Tuple[Dict, np.ndarray]:
         # Extract structured information
-        extracted_info = {
-            'skills': self._extract_skills(text),
-            'experience': self._extract_experience(text),
-            'education': self._extract_education(text)
-        }
+        extracted_info = self._extract_info(text)
         
         # Get semantic embedding
         embedding = self.sentence_transformer.encode(text)
         
         return extracted_info, embedding
         
+    def process_unstructured_batch(self, texts: List[str], batch_size: int = 64,
+                                   timings: Dict[str, float] = None, n_process: int = 1) -> Tuple[List[Dict], np.ndarray]:
+        """Process many texts at once, encoding them in batches.
+        
+        Returns the extracted info per text and an embedding matrix with one row
+        per text. Stage durations are added to `timings` when given.
+        """
+        start = time.perf_counter()
+        extracted_info = [
+            {
+                'skills': skills,
+                'experience': self._extract_experience(text),
+                'education': self._extract_education(text)
+            }
+            for text, skills in self._iter_skills(texts, n_process=n_process)
+        ]
+        extracted = time.perf_counter()
+        embeddings = self.encode_batch(texts, batch_size=batch_size)
+        encoded = time.perf_counter()
+        
+        if timings is not None:
+            timings['extraction'] = timings.get('extraction', 0.0) + extracted - start
+            timings['encoding'] = timings.get('encoding', 0.0) + encoded - extracted
+        return extracted_info, embeddings
+        
+    def extract_skills_batch(self, texts: List[str], n_process: int = 1) -> List[List[str]]:
+        """Extract skills from many texts.
+        
+        With `single_flight` set, texts another thread is already parsing are
+        waited for rather than parsed again.
+        """
+        if self.single_flight is not None:
+            return self.single_flight.do_many(
+                [self._text_key(text, 'skills') for text in texts],
+                lambda positions: [
+                    skills for _, skills in self._iter_skills([texts[p] for p in positions], n_process=n_process)
+                ]
+            )
+        return [skills for _, skills in self._iter_skills(texts, n_process=n_process)]
+        
+    def iter_unstructured_data(self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1,
+                               nlp_batch_size: int = 256) -> Iterator[Tuple[List[str], float, str, np.ndarray]]:
+        """Stream (skills, experience, education, embedding) for each text, in input order.
+        
+        Skill phrases from all texts go through a single `nlp.pipe` call with
+        `n_process` worker processes, and texts are embedded `batch_size` at a
+        time as their skills come back. Only a bounded window of texts is held
+        in memory, so `texts` can be an arbitrarily long iterator.
+        """
+        batch = []
+        for text, skills in self._iter_skills(texts, n_process=n_process, nlp_batch_size=nlp_batch_size):
+            batch.append((text, skills))
+            if len(batch) == batch_size:
+                yield from self._finish_unstructured(batch, batch_size)
+                batch = []
+        if batch:
+            yield from self._finish_unstructured(batch, batch_size)
+            
+    def _finish_unstructured(self, batch: List[Tuple[str, List[str]]], batch_size: int):
+        embeddings = self.encode_batch([text for text, _ in batch], batch_size=batch_size)
+        for (text, skills), embedding in zip(batch, embeddings):
+            yield skills, self._extract_experience(text), self._extract_education(text), embedding
+            
+    def _iter_skills(self, texts: Iterable[str], n_process: int = 1,
+                     nlp_batch_size: int = 256) -> Iterator[Tuple[str, List[str]]]:
+        """Yield (text, skills) in input order, parsing all skill phrases in one `nlp.pipe` stream"""
+        # [text, phrases still to parse, skill tokens so far], in input order
+        pending = deque()
+        
+        def phrases():
+            for text in texts:
+                text_phrases = self._skill_phrases(text)
+                # An empty phrase keeps texts without skills flowing through the
+                # pipe in order instead of piling up ahead of it
+                text_phrases = text_phrases or ['']
+                pending.append([text, len(text_phrases), []])
+                yield from text_phrases
+                
+        # nlp.pipe returns docs in input order, so each belongs to the oldest unfinished text
+        for doc in self.nlp.pipe(phrases(), batch_size=nlp_batch_size, n_process=n_process):
+            entry = pending[0]
+            entry[2].extend(token.text for token in doc if token.pos_ in ('NOUN', 'PROPN'))
+            entry[1] -= 1
+            if entry[1] == 0:
+                pending.popleft()
+                yield entry[0], list(set(entry[2]))
+                
+    def _skill_phrases(self, text: str) -> List[str]:
+        """Phrases following the skill indicators in `text`"""
+        lowered = text.lower()
+        phrases = []
+        for indicator in SKILL_INDICATORS:
+            if indicator in lowered:
+                # Extract the skill after the indicator
+                start_idx = lowered.find(indicator) + len(indicator)
+                end_idx = text.find('.', start_idx) if '.' in text[start_idx:] else len(text)
+                phrases.append(text[start_idx:end_idx].strip())
+        return phrases
+        
+    def encode_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed many texts, one row per text.
+        
+        With `single_flight` set, texts another thread is already embedding
+        are waited for rather than embedded again.
+        """
+        if self.single_flight is not None and len(texts):
+            rows = self.single_flight.do_many(
+                [self._text_key(text, 'embedding') for text in texts],
+                lambda positions: list(self._encode_batch([texts[p] for p in positions], batch_size))
+            )
+            return np.stack(rows)
+        return self._encode_batch(texts, batch_size)
+        
+    def _encode_batch(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return np.asarray(self.sentence_transformer.encode(list(texts), batch_size=batch_size))
+        
+    def _extract_info(self, text: str) -> Dict:
+        """Extract skills, years of experience and education level from text"""
+        return {
+            'skills': self._extract_skills(text),
+            'experience': self._extract_experience(text),
+            'education': self._extract_education(text)
+        }
+        
     def _extract_skills(self, text: str) -> List[str]:
         """Extract skills from text using NLP"""
-        doc = self.nlp(text.lower())
         skills = []
-        
-        # Common skill indicators
-        skill_indicators = ['proficient in', 'experience with', 'knowledge of', 'skilled in']
-        
-        for indicator in skill_indicators:
-            if indicator in text.lower():
-                # Extract the skill after the indicator
-                start_idx = text.lower().find(indicator) + len(indicator)
-                end_idx = text.find('.', start_idx) if '.' in text[start_idx:] else len(text)
-                skill_text = text[start_idx:end_idx].strip()
-                skills.extend([token.text for token in self.nlp(skill_text) if token.pos_ in ['NOUN', 'PROPN']])
+        for doc in self.nlp.pipe(self._skill_phrases(text)):
+            skills.extend([token.text for token in doc if token.pos_ in ['NOUN', 'PROPN']])
         
         return list(set(skills))
         
+    def skill_terms(self, skills: List[str]) -> List[str]:
+        """Tokenize a skill list the same way the TF-IDF vectorizer does"""
+        return self.tfidf_vectorizer.build_analyzer()(' '.join(skills))
+        
     def _extract_experience(self, text: str) -> float:
         """Extract years of experience from text"""
         experience_pattern = r'(\d+)\s*(?:year|yr)s?\s+experience'
@@ -84,10 +269,19 @@ class MixedDataProcessor:
         return education_map.get(education, 0.0)
 
 class HybridMatcher:
-    def __init__(self):
-        self.processor = MixedDataProcessor()
+    def __init__(self, processor: MixedDataProcessor = None):
+        # Reuse an already-loaded processor when given to skip the NLP cold start
+        self.processor = processor if processor is not None else MixedDataProcessor()
         self.random_forest = RandomForestRegressor()
+        self.schema = FEATURE_SCHEMA
+        # Skill IDs and the IDF weights for the weighted skill coverage feature,
+        # both fitted in `train` and fixed afterwards
+        self.skill_taxonomy = SkillTaxonomy()
+        self.skill_weights = SkillWeights()
         self.is_trained = False
+        self._explainer = None
+        # Key of the SharedArrayStore arrays the forest is served from, if any
+        self.shared_key = None
         
     def _calculate_structured_similarity(self, candidate: Dict, job: Dict) -> float:
         """Calculate similarity between structured features"""
@@ -107,8 +301,14 @@ class HybridMatcher:
         # Calculate base structured similarity
         return np.mean(similarities)
         
-    def prepare_features(self, candidate_data: Dict, job_data: Dict) -> pd.DataFrame:
-        """Prepare features from mixed data sources"""
+    def _calculate_structured_similarity_batch(self, candidate: Dict[str, np.ndarray], job: Dict[str, np.ndarray]) -> np.ndarray:
+        """Vectorized `_calculate_structured_similarity` over aligned arrays of structured features"""
+        exp_similarity = np.minimum(candidate['years_experience'] / np.maximum(job['years_experience'], 1), 1.0)
+        edu_similarity = np.where(candidate['education_level'] >= job['education_level'], 1.0, 0.5)
+        return (exp_similarity + edu_similarity + candidate['location_match']) / 3.0
+        
+    def prepare_features(self, candidate_data: Dict, job_data: Dict) -> np.ndarray:
+        """Prepare a single feature row (shape 1 x n_features) from mixed data sources"""
         # Process structured data
         candidate_structured = self.processor.process_structured_data(
             candidate_data.get('structured', {})
@@ -143,6 +343,10 @@ class HybridMatcher:
             job_unstructured[0]
         )
         
+        # Skill overlap over taxonomy IDs
+        skill_matrix = self._skill_matrix([candidate_unstructured[0]['skills'], job_unstructured[0]['skills']])
+        skill_features = self._calculate_skill_features(skill_matrix[0:1], skill_matrix[1:2])
+        
         # Combine all features
         features = {
             'structured_similarity': structured_similarity,
@@ -150,10 +354,217 @@ class HybridMatcher:
             'tfidf_similarity': tfidf_similarity,
             'years_experience': candidate_structured['years_experience'],
             'education_level': candidate_structured['education_level'],
-            'location_match': candidate_structured['location_match']
+            'location_match': candidate_structured['location_match'],
+            **{name: values[0] for name, values in skill_features.items()}
+        }
+        
+        return self.schema.fill(self.schema.empty(1), features)
+        
+    def prepare_features_batch(self, candidates: List[Dict], jobs: List[Dict], batch_size: int = 64,
+                               timings: Dict[str, float] = None, n_process: int = 1,
+                               fit_skills: bool = False) -> np.ndarray:
+        """Prepare features for aligned lists of candidates and jobs.
+        
+        Returns one row per pair in the layout of `schema`, like
+        `prepare_features`, but each distinct text
+        is processed once and embeddings are computed in batches. Skill
+        extraction uses `n_process` spaCy worker processes. Stage durations are
+        added to `timings` when given. With `fit_skills` the skill taxonomy
+        and weights are first rebuilt from the distinct profiles (used by `train`).
+        """
+        parsed = self.parse_pairs(candidates, jobs, timings=timings, n_process=n_process)
+        embeddings = self.encode_pairs(parsed, batch_size=batch_size, timings=timings)
+        if fit_skills:
+            self.skill_taxonomy = SkillTaxonomy(skill for skills in parsed['skills'] for skill in skills)
+            self.skill_weights.fit(parsed['skills'], self.skill_taxonomy)
+        return self.featurize_pairs(parsed, embeddings, timings=timings)
+        
+    def parse_pairs(self, candidates: List[Dict], jobs: List[Dict], timings: Dict[str, float] = None,
+                    n_process: int = 1) -> Dict:
+        """First stage of `prepare_features_batch`: structured features of each
+        pair and skills of each distinct text.
+        
+        The stages are separate so `StagedPipeline` can run them concurrently
+        on different chunks of pairs.
+        """
+        timings = timings if timings is not None else {}
+        
+        start = time.perf_counter()
+        candidate_structured = self._structured_arrays(
+            [self.processor.process_structured_data(c.get('structured', {})) for c in candidates]
+        )
+        job_structured = self._structured_arrays(
+            [self.processor.process_structured_data(j.get('structured', {})) for j in jobs]
+        )
+        timings['structured'] = timings.get('structured', 0.0) + time.perf_counter() - start
+        
+        # Jobs are usually paired with many candidates, so process each text once
+        texts = [c.get('unstructured', '') for c in candidates] + [j.get('unstructured', '') for j in jobs]
+        positions = {}
+        rows = np.array([positions.setdefault(text, len(positions)) for text in texts], dtype=np.int64)
+        
+        start = time.perf_counter()
+        skills = self.processor.extract_skills_batch(list(positions), n_process=n_process)
+        timings['extraction'] = timings.get('extraction', 0.0) + time.perf_counter() - start
+        
+        return {
+            'n_pairs': len(candidates),
+            'candidate_structured': candidate_structured,
+            'job_structured': job_structured,
+            'texts': list(positions),
+            'rows': rows,
+            'skills': skills,
+        }
+        
+    def encode_pairs(self, parsed: Dict, batch_size: int = 64, timings: Dict[str, float] = None) -> np.ndarray:
+        """Second stage of `prepare_features_batch`: normalized embeddings of the distinct texts"""
+        timings = timings if timings is not None else {}
+        
+        start = time.perf_counter()
+        embeddings = self._normalize_rows(self.processor.encode_batch(parsed['texts'], batch_size=batch_size))
+        timings['encoding'] = timings.get('encoding', 0.0) + time.perf_counter() - start
+        return embeddings
+        
+    def featurize_pairs(self, parsed: Dict, embeddings: np.ndarray, timings: Dict[str, float] = None) -> np.ndarray:
+        """Last stage of `prepare_features_batch`: feature rows from the parsed pairs and their embeddings"""
+        timings = timings if timings is not None else {}
+        
+        start = time.perf_counter()
+        n_pairs = parsed['n_pairs']
+        candidate_rows, job_rows = parsed['rows'][:n_pairs], parsed['rows'][n_pairs:]
+        term_counts = self._skill_term_matrix(parsed['skills'])
+        skill_matrix = self._skill_matrix(parsed['skills'])
+        features = self._pair_features(
+            parsed['candidate_structured'], parsed['job_structured'],
+            embeddings[candidate_rows], embeddings[job_rows],
+            term_counts[candidate_rows], term_counts[job_rows],
+            skill_matrix[candidate_rows], skill_matrix[job_rows]
+        )
+        timings['similarity'] = timings.get('similarity', 0.0) + time.perf_counter() - start
+        return features
+        
+    def prepare_features_columns(self, n_pairs: int, candidate: Dict, job: Dict, batch_size: int = 64,
+                                 timings: Dict[str, float] = None) -> np.ndarray:
+        """Prepare features for pairs given column-wise rather than as per-pair dicts.
+        
+        Each side maps column names to one value per pair: `years_experience`,
+        `education_level` (encoded values or level names) and `location_match`
+        for the structured features (missing columns count as 0), and either
+        precomputed `skills` and `embedding` (an n_pairs x dim matrix) or the
+        raw `text` to compute whichever of them is missing.
+        """
+        timings = timings if timings is not None else {}
+        
+        start = time.perf_counter()
+        candidate_structured = self._structured_columns(candidate, n_pairs)
+        job_structured = self._structured_columns(job, n_pairs)
+        timings['structured'] = timings.get('structured', 0.0) + time.perf_counter() - start
+        
+        candidate_skills, candidate_embeddings = self._unstructured_columns(candidate, batch_size, timings)
+        job_skills, job_embeddings = self._unstructured_columns(job, batch_size, timings)
+        
+        start = time.perf_counter()
+        skill_lists = list(candidate_skills) + list(job_skills)
+        term_counts = self._skill_term_matrix(skill_lists)
+        skill_matrix = self._skill_matrix(skill_lists)
+        features = self._pair_features(
+            candidate_structured, job_structured,
+            candidate_embeddings, job_embeddings,
+            term_counts[:n_pairs], term_counts[n_pairs:],
+            skill_matrix[:n_pairs], skill_matrix[n_pairs:]
+        )
+        timings['similarity'] = timings.get('similarity', 0.0) + time.perf_counter() - start
+        return features
+        
+    def _structured_columns(self, columns: Dict, n_pairs: int) -> Dict[str, np.ndarray]:
+        structured = {}
+        for name in ('years_experience', 'education_level', 'location_match'):
+            values = columns.get(name)
+            if values is None:
+                structured[name] = np.zeros(n_pairs, dtype=np.float64)
+            elif name == 'education_level' and len(values) and isinstance(values[0], str):
+                structured[name] = np.array([self.processor._encode_education(v) for v in values], dtype=np.float64)
+            else:
+                structured[name] = np.asarray(values, dtype=np.float64)
+        return structured
+        
+    def _unstructured_columns(self, columns: Dict, batch_size: int, timings: Dict[str, float]) -> Tuple[List, np.ndarray]:
+        skills, embeddings = columns.get('skills'), columns.get('embedding')
+        if skills is None or embeddings is None:
+            if columns.get('text') is None:
+                raise ValueError("Each side needs 'text' unless both 'skills' and 'embedding' are given")
+            # Identical texts (e.g. one job paired with many candidates) are processed once
+            positions = {}
+            rows = np.array([positions.setdefault(text, len(positions)) for text in columns['text']], dtype=np.int64)
+            unique_texts = list(positions)
+            if skills is None:
+                start = time.perf_counter()
+                unique_skills = self.processor.extract_skills_batch(unique_texts)
+                skills = [unique_skills[row] for row in rows]
+                timings['extraction'] = timings.get('extraction', 0.0) + time.perf_counter() - start
+            if embeddings is None:
+                start = time.perf_counter()
+                embeddings = self.processor.encode_batch(unique_texts, batch_size=batch_size)[rows]
+                timings['encoding'] = timings.get('encoding', 0.0) + time.perf_counter() - start
+        return skills, self._normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        
+    def _pair_features(self, candidate_structured: Dict[str, np.ndarray], job_structured: Dict[str, np.ndarray],
+                       candidate_embeddings: np.ndarray, job_embeddings: np.ndarray,
+                       candidate_terms: sparse.csr_matrix, job_terms: sparse.csr_matrix,
+                       candidate_skills: sparse.csr_matrix, job_skills: sparse.csr_matrix) -> np.ndarray:
+        """Features for aligned pairs from their structured columns, normalized embeddings,
+        skill term counts and binary skill ID matrices"""
+        structured_similarity = self._calculate_structured_similarity_batch(candidate_structured, job_structured)
+        semantic_similarity = np.einsum('ij,ij->i', candidate_embeddings, job_embeddings)
+        tfidf_similarity = self._calculate_tfidf_similarity_batch(candidate_terms, job_terms)
+        skill_features = self._calculate_skill_features(candidate_skills, job_skills)
+        return self._feature_matrix(
+            structured_similarity, semantic_similarity, tfidf_similarity, candidate_structured, skill_features
+        )
+        
+    @staticmethod
+    def _normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+        
+    def _structured_arrays(self, rows: List[Dict]) -> Dict[str, np.ndarray]:
+        """Turn a list of structured feature dicts into one array per feature"""
+        return {
+            name: np.array([row[name] for row in rows], dtype=np.float64)
+            for name in ('years_experience', 'education_level', 'location_match')
         }
         
-        return pd.DataFrame([features])
+    def _skill_term_matrix(self, skill_lists: List[List[str]]) -> sparse.csr_matrix:
+        """Skill term counts for several skill lists over a shared vocabulary"""
+        vocabulary = {}
+        indices, indptr = [], [0]
+        for skills in skill_lists:
+            indices.extend(vocabulary.setdefault(term, len(vocabulary)) for term in self.processor.skill_terms(skills))
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices)), indices, indptr), shape=(len(skill_lists), len(vocabulary))
+        )
+        # Repeated terms become duplicate entries; summing them gives the counts
+        matrix.sum_duplicates()
+        return matrix
+        
+    def _skill_matrix(self, skill_lists: List[List[str]]) -> sparse.csr_matrix:
+        """Binary skill ID matrix (one row per skill list) over the model's taxonomy.
+        
+        Skills the taxonomy does not know get columns past its end that are
+        local to this call.
+        """
+        taxonomy = self.skill_taxonomy
+        extension = {}
+        id_lists = [taxonomy.to_ids(skills, extension) for skills in skill_lists]
+        return taxonomy.matrix(id_lists, len(taxonomy) + len(extension))
+        
+    def _calculate_skill_features(self, candidate_skills: sparse.csr_matrix,
+                                  job_skills: sparse.csr_matrix) -> Dict[str, np.ndarray]:
+        """Skill overlap, Jaccard and weighted coverage for aligned rows of skill ID matrices"""
+        n_columns = max(candidate_skills.shape[1], job_skills.shape[1])
+        weights = self.skill_weights.vector(self.skill_taxonomy, n_columns)
+        return skill_overlap_features(candidate_skills, job_skills, weights)
         
     def _calculate_tfidf_similarity(self, candidate_info: Dict, job_info: Dict) -> float:
         """Calculate TF-IDF similarity for specific fields"""
@@ -165,28 +576,130 @@ class HybridMatcher:
             job_skills = ' '.join(job_info['skills'])
             
             if candidate_skills and job_skills:
-                tfidf_matrix = self.processor.tfidf_vectorizer.fit_transform([candidate_skills, job_skills])
-                similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+                # Same result as fitting TF-IDF on the pair, without mutating the
+                # shared vectorizer (which is not safe across request threads)
+                term_counts = self._skill_term_matrix([candidate_info['skills'], job_info['skills']])
+                similarity = self._calculate_tfidf_similarity_batch(term_counts[0:1], term_counts[1:2])[0]
                 similarities.append(similarity)
         
         return np.mean(similarities) if similarities else 0.0
         
-    def train(self, training_data: List[Dict]) -> None:
+    def _calculate_tfidf_similarity_batch(self, candidate_counts: sparse.csr_matrix, job_counts: sparse.csr_matrix) -> np.ndarray:
+        """Vectorized `_calculate_tfidf_similarity` over aligned rows of skill term counts.
+        
+        Fitting TF-IDF on each (candidate, job) pair gives shared terms an IDF of 1
+        and all other terms `_PAIR_IDF_UNSHARED`, so the pairwise cosine can be
+        computed from the raw counts without fitting a vectorizer per pair.
+        """
+        shared = candidate_counts.multiply(job_counts)
+        dot = np.asarray(shared.sum(axis=1)).ravel()
+        shared_mask = (shared > 0).astype(np.float64)
+        
+        def _squared_norms(counts: sparse.csr_matrix) -> np.ndarray:
+            squared = counts.multiply(counts)
+            total = np.asarray(squared.sum(axis=1)).ravel()
+            on_shared = np.asarray(squared.multiply(shared_mask).sum(axis=1)).ravel()
+            return _PAIR_IDF_UNSHARED ** 2 * (total - on_shared) + on_shared
+            
+        denominator = np.sqrt(_squared_norms(candidate_counts) * _squared_norms(job_counts))
+        return np.divide(dot, denominator, out=np.zeros_like(dot), where=denominator > 0)
+        
+    def _feature_matrix(self, structured_similarity: np.ndarray, semantic_similarity: np.ndarray,
+                        tfidf_similarity: np.ndarray, candidate: Dict[str, np.ndarray],
+                        skill_features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Write feature columns for many pairs into a preallocated matrix in `schema` order"""
+        return self.schema.fill(self.schema.empty(len(structured_similarity)), {
+            'structured_similarity': structured_similarity,
+            'semantic_similarity': semantic_similarity,
+            'tfidf_similarity': tfidf_similarity,
+            'years_experience': candidate['years_experience'],
+            'education_level': candidate['education_level'],
+            'location_match': candidate['location_match'],
+            **skill_features
+        })
+        
+    def recommend_jobs(self, candidate_data: Dict, job_index, top_k: int = 10) -> List[Dict]:
+        """Score a candidate against every job in a `ProfileIndex` in one vectorized pass"""
+        ranked = self._rank_against_index(candidate_data, job_index, top_k, query_is_candidate=True)
+        return [{'job_id': job_id, 'score': score} for job_id, score in ranked]
+        
+    def rank_candidates(self, job_data: Dict, candidate_index, top_k: int = 10) -> List[Dict]:
+        """Score a job against every candidate in a `ProfileIndex` in one vectorized pass"""
+        ranked = self._rank_against_index(job_data, candidate_index, top_k, query_is_candidate=False)
+        return [{'candidate_id': candidate_id, 'score': score} for candidate_id, score in ranked]
+        
+    def _rank_against_index(self, query_data: Dict, index, top_k: int,
+                            query_is_candidate: bool) -> List[Tuple[object, float]]:
+        """Top (profile ID, score) pairs for one profile scored against every profile in `index`"""
+        if not self.is_trained:
+            raise ValueError("Model must be trained before making predictions")
+            
+        query_structured = self.processor.process_structured_data(
+            query_data.get('structured', {})
+        )
+        query_info, query_embedding = self.processor.process_unstructured_data(
+            query_data.get('unstructured', '')
+        )
+        norm = np.linalg.norm(query_embedding)
+        if norm > 0:
+            query_embedding = query_embedding / norm
+            
+        # Hold the index lock only while reading it; the forest runs on copies
+        with index.lock:
+            profile_ids = index.ids
+            if not profile_ids or top_k < 1:
+                return []
+            n_profiles = len(profile_ids)
+            query = {
+                name: np.full(n_profiles, value, dtype=np.float64)
+                for name, value in query_structured.items()
+            }
+            # Copies: the profile columns are used after the lock is released, when
+            # upserts and swap-with-last removals may rewrite the index's buffers
+            profiles = {field: values.copy() for field, values in index.structured_arrays().items()}
+            candidate, job = (query, profiles) if query_is_candidate else (profiles, query)
+            structured_similarity = self._calculate_structured_similarity_batch(candidate, job)
+            semantic_similarity = index.embeddings @ query_embedding.astype(np.float32)
+            query_terms = index.query_term_counts(query_info['skills'])
+            profile_terms = index.term_counts(n_columns=query_terms.shape[1])
+            profile_skills, skill_extension = index.skill_matrix(self.skill_taxonomy)
+            
+        query_terms.resize(1, profile_terms.shape[1])
+        tfidf_similarity = self._calculate_tfidf_similarity_batch(
+            query_terms[np.zeros(n_profiles, dtype=np.int64)], profile_terms
+        )
+        # Query skills missing from the taxonomy extend the index's columns for this request only
+        query_skill_ids = self.skill_taxonomy.to_ids(query_info['skills'], skill_extension)
+        weights = self.skill_weights.vector(
+            self.skill_taxonomy, len(self.skill_taxonomy) + len(skill_extension)
+        )
+        skill_features = skill_overlap_one_to_many(
+            query_skill_ids, profile_skills, weights, query_is_job=not query_is_candidate
+        )
+        
+        features = self._feature_matrix(
+            structured_similarity, semantic_similarity, tfidf_similarity, candidate, skill_features
+        )
+        scores = self.predict_features(features)
+        
+        top_k = min(top_k, n_profiles)
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [(profile_ids[i], float(scores[i])) for i in top]
+        
+    def train(self, training_data: List[Dict], n_process: int = 1) -> None:
         """Train the model on labeled data"""
-        X = []
-        y = []
+        X = self.prepare_features_batch(
+            [sample['candidate'] for sample in training_data],
+            [sample['job'] for sample in training_data],
+            n_process=n_process,
+            fit_skills=True
+        )
+        y = [sample['match_score'] for sample in training_data]
         
-        for sample in training_data:
-            features = self.prepare_features(
-                sample['candidate'],
-                sample['job']
-            )
-            X.append(features.iloc[0].to_dict())
-            y.append(sample['match_score'])
-            
-        X_df = pd.DataFrame(X)
-        self.random_forest.fit(X_df, y)
+        self.random_forest.fit(X, y)
         self.is_trained = True
+        self._explainer = None
         
     def predict_score(self, candidate_data: Dict, job_data: Dict) -> Tuple[float, Dict]:
         """Predict matching score and provide explanation"""
@@ -194,17 +707,26 @@ class HybridMatcher:
             raise ValueError("Model must be trained before making predictions")
             
         features = self.prepare_features(candidate_data, job_data)
-        score = self.random_forest.predict(features)[0]
+        return self.predict_from_features(features)
+        
+    def predict_features(self, features: np.ndarray) -> np.ndarray:
+        """Predict scores for already prepared feature rows, skipping explanations"""
+        if not self.is_trained:
+            raise ValueError("Model must be trained before making predictions")
+            
+        return self.random_forest.predict(features)
+        
+    def predict_from_features(self, features: np.ndarray) -> Tuple[float, Dict]:
+        """Predict score and explanation for a single prepared feature row"""
+        score = self.predict_features(features)[0]
         
         # Get feature importances
-        importances = dict(zip(features.columns, self.random_forest.feature_importances_))
+        importances = dict(zip(self.schema.columns, self.random_forest.feature_importances_))
         
         # Get feature contributions using SHAP (if available)
         try:
-            import shap
-            explainer = shap.TreeExplainer(self.random_forest)
-            shap_values = explainer.shap_values(features)
-            contributions = dict(zip(features.columns, shap_values[0]))
+            shap_values = self._get_explainer().shap_values(features)
+            contributions = dict(zip(self.schema.columns, shap_values[0]))
         except ImportError:
             contributions = None
             
@@ -216,19 +738,83 @@ class HybridMatcher:
         
         return score, explanation
         
+    def prepare_explainer(self) -> bool:
+        """Build the SHAP explainer ahead of the first explained prediction.
+        
+        Returns False if SHAP is not installed.
+        """
+        try:
+            self._get_explainer()
+        except ImportError:
+            return False
+        return True
+        
+    def _get_explainer(self):
+        """Build the SHAP explainer once per trained forest"""
+        if self._explainer is None:
+            import shap
+            forest = self.random_forest
+            # A shared FlatForest is handed to SHAP in its dictionary tree format
+            model = forest.tree_explainer_model() if hasattr(forest, 'tree_explainer_model') else forest
+            self._explainer = shap.TreeExplainer(model)
+        return self._explainer
+        
+    def featurizes_like(self, other: 'HybridMatcher') -> bool:
+        """Whether `other` computes the same values for all of this model's feature columns.
+        
+        Only the skill features depend on what a model was fitted on: all of
+        them on the taxonomy's aliases, and the weighted coverage also on the
+        skill weights. Which names the taxonomy lists does not matter, since
+        unknown skills are compared by name and weighted like unfitted ones.
+        """
+        if not any(name.startswith('skill_') for name in self.schema.columns):
+            return True
+        if self.skill_taxonomy.aliases != other.skill_taxonomy.aliases:
+            return False
+        return ('skill_weighted_coverage' not in self.schema.index
+                or self.skill_weights.matches(other.skill_weights))
+        
+    def share_arrays(self, store, key: str) -> None:
+        """Serve from a flattened copy of the forest held in a `SharedArrayStore`.
+        
+        Worker processes sharing the same store and key map the same forest
+        arrays instead of each unpickling a private copy. The shared forest can
+        predict and explain but not be retrained.
+        """
+        from .flat_forest import FlatForest
+        
+        if not hasattr(self.random_forest, 'tree_explainer_model'):
+            self.random_forest = FlatForest.from_forest(self.random_forest)
+        self.random_forest.share(store, key)
+        self.shared_key = key
+        self._explainer = None
+        
     def save(self, path: str) -> None:
         """Save the model to disk"""
         model_data = {
             'random_forest': self.random_forest,
+            'feature_columns': list(self.schema.columns),
+            'skill_taxonomy': self.skill_taxonomy,
+            'skill_weights': self.skill_weights,
             'is_trained': self.is_trained
         }
         joblib.dump(model_data, path)
         
     @classmethod
-    def load(cls, path: str) -> 'HybridMatcher':
-        """Load the model from disk"""
-        matcher = cls()
+    def load(cls, path: str, processor: MixedDataProcessor = None) -> 'HybridMatcher':
+        """Load the model from disk, optionally sharing an existing processor"""
+        matcher = cls(processor)
         model_data = joblib.load(path)
         matcher.random_forest = model_data['random_forest']
+        matcher.schema = FeatureSchema(model_data.get('feature_columns', LEGACY_FEATURE_COLUMNS))
+        matcher.skill_weights = model_data.get('skill_weights', SkillWeights())
+        # Models saved without a taxonomy: the skills the weights were fitted on
+        matcher.skill_taxonomy = model_data.get(
+            'skill_taxonomy', SkillTaxonomy(sorted(matcher.skill_weights.document_frequency))
+        )
         matcher.is_trained = model_data['is_trained']
-        return matcher 
\ No newline at end of file
+        # Forests saved before the array pipeline were fitted on DataFrames; the
+        # column names now live in the schema, so drop them to avoid name checks
+        if hasattr(matcher.random_forest, 'feature_names_in_'):
+            del matcher.random_forest.feature_names_in_
+        return matcher
\ No newline at end of file
@@ -0,0 +1,298 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .hybrid_matcher import HybridMatcher
+
+# Stages in the order a chunk of pairs passes through them
+STAGES = ('parse', 'encode', 'score')
+
+
+def parse_concurrency(spec: str) -> Dict[str, int]:
+    """Workers per stage from a spec like `parse=2,encode=1,score=1`"""
+    concurrency = {}
+    for part in filter(None, spec.split(',')):
+        stage, workers = part.split('=')
+        concurrency[stage.strip()] = int(workers)
+    return concurrency
+
+
+class StagedPipeline:
+    """Featurize and score chunks of pairs in overlapping stages.
+
+    `parse` (structured features and spaCy skill extraction), `encode`
+    (sentence embeddings) and `score` (similarity features and the forest) each
+    run on their own thread pool, connected by bounded asyncio queues. While
+    chunk N is encoded, chunk N+1 is parsed and chunk N-1 scored; when a stage
+    falls behind, its input queue fills up and the stages before it wait.
+
+    `concurrency` sets the number of workers per stage (1 each by default) and
+    `queue_size` the number of chunks that may wait in front of a stage. The
+    matcher is passed with each chunk, so requests keep the model they started
+    with across a hot-swap.
+
+    Skill extraction runs in the parse workers' own process: spaCy's
+    `n_process` would start and tear down a process pool for every chunk, so
+    the parse stage is scaled with more workers instead.
+    """
+
+    def __init__(self, concurrency: Dict[str, int] = None, queue_size: int = 2,
+                 batch_size: int = 64):
+        self.concurrency = {stage: 1 for stage in STAGES}
+        self.concurrency.update(concurrency or {})
+        unknown = set(self.concurrency) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages: {sorted(unknown)}")
+        if min(self.concurrency.values()) < 1:
+            raise ValueError("Each stage needs at least one worker")
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._loop = None
+        self._queues = None
+        self._executors = {}
+        self._workers = []
+        self._pending = set()
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self._started_at = None
+        self._busy = {stage: 0.0 for stage in STAGES}
+        self._items = {stage: 0 for stage in STAGES}
+        self._pairs = 0
+
+    @property
+    def running(self) -> bool:
+        return self._queues is not None
+
+    async def start(self) -> None:
+        """Start the stage workers on the running event loop"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in STAGES}
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"pipeline-{stage}")
+            for stage, workers in self.concurrency.items()
+        }
+        self._reset_stats()
+        self._started_at = time.perf_counter()
+        self._workers = [
+            asyncio.create_task(self._work(stage))
+            for stage in STAGES
+            for _ in range(self.concurrency[stage])
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers; chunks that have not been scored yet are cancelled"""
+        if not self.running:
+            return
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for future in list(self._pending):
+            future.cancel()
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._queues = None
+        self._executors = {}
+        self._workers = []
+
+    async def submit(self, matcher: HybridMatcher, candidates: List[Dict], jobs: List[Dict],
+                     explain: bool = False):
+        """Featurize and score aligned lists of candidates and jobs.
+
+        Returns the scores, or for a single pair with `explain=True` the
+        (features, score, explanation) of `HybridMatcher.predict_from_features`.
+        Waits while the first stage's queue is full.
+        """
+        if not self.running:
+            raise RuntimeError("Pipeline is not running")
+        future = self._loop.create_future()
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        await self._queues['parse'].put({
+            'matcher': matcher,
+            'candidates': candidates,
+            'jobs': jobs,
+            'explain': explain,
+            'future': future,
+        })
+        return await future
+
+    async def map(self, matcher: HybridMatcher,
+                  chunks: Iterable[Tuple[List[Dict], List[Dict]]]) -> AsyncIterator[np.ndarray]:
+        """Yield the scores of each (candidates, jobs) chunk, in input order.
+
+        Only as many chunks as the stages and their queues can hold are in
+        flight, so `chunks` can be a long iterator.
+        """
+        window = self.queue_size * len(STAGES) + sum(self.concurrency.values())
+        pending = deque()
+        try:
+            for candidates, jobs in chunks:
+                pending.append(asyncio.ensure_future(self.submit(matcher, candidates, jobs)))
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def run(self, matcher: HybridMatcher,
+            chunks: Iterable[Tuple[List[Dict], List[Dict]]]) -> Tuple[np.ndarray, Dict]:
+        """Score all chunks on a private event loop.
+
+        Returns the concatenated scores and the pipeline statistics.
+        """
+        if self.running:
+            raise RuntimeError("Pipeline is already running on another event loop")
+
+        async def _run():
+            await self.start()
+            try:
+                scores = [chunk_scores async for chunk_scores in self.map(matcher, chunks)]
+            finally:
+                stats = self.stats()
+                await self.stop()
+            return scores, stats
+
+        scores, stats = asyncio.run(_run())
+        return (np.concatenate(scores) if scores else np.zeros(0)), stats
+
+    async def _work(self, stage: str) -> None:
+        queue = self._queues[stage]
+        position = STAGES.index(stage)
+        next_queue = self._queues[STAGES[position + 1]] if position + 1 < len(STAGES) else None
+        run_stage = getattr(self, f"_{stage}")
+
+        while True:
+            item = await queue.get()
+            future = item['future']
+            # The caller may have given up on this chunk
+            if future.done():
+                continue
+            try:
+                result, seconds = await self._loop.run_in_executor(self._executors[stage], self._timed, run_stage, item)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+
+            self._busy[stage] += seconds
+            self._items[stage] += 1
+            if next_queue is not None:
+                await next_queue.put(item)
+            else:
+                self._pairs += len(item['candidates'])
+                if not future.done():
+                    future.set_result(result)
+
+    @staticmethod
+    def _timed(run_stage, item: Dict):
+        start = time.perf_counter()
+        result = run_stage(item)
+        return result, time.perf_counter() - start
+
+    def _parse(self, item: Dict) -> None:
+        item['parsed'] = item['matcher'].parse_pairs(item['candidates'], item['jobs'])
+
+    def _encode(self, item: Dict) -> None:
+        item['embeddings'] = item['matcher'].encode_pairs(item['parsed'], batch_size=self.batch_size)
+
+    def _score(self, item: Dict):
+        matcher = item['matcher']
+        features = matcher.featurize_pairs(item['parsed'], item['embeddings'])
+        if item['explain']:
+            return (features, *matcher.predict_from_features(features))
+        return matcher.predict_features(features)
+
+    def stats(self) -> Dict:
+        """Throughput since `start` and how busy each stage's workers were"""
+        seconds = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+        stages = {}
+        for stage in STAGES:
+            capacity = seconds * self.concurrency[stage]
+            stages[stage] = {
+                'workers': self.concurrency[stage],
+                'chunks': self._items[stage],
+                'busy_seconds': self._busy[stage],
+                'utilization': self._busy[stage] / capacity if capacity > 0 else 0.0,
+                'queued': self._queues[stage].qsize() if self.running else 0,
+            }
+        return {
+            'running': self.running,
+            'queue_size': self.queue_size,
+            'seconds': seconds,
+            'pairs': self._pairs,
+            'pairs_per_second': self._pairs / seconds if seconds > 0 else 0.0,
+            'stages': stages,
+        }
+
+
+def benchmark_pipeline(matcher: HybridMatcher, candidates: List[Dict], jobs: List[Dict],
+                       chunk_size: int = 256, repeats: int = 3, **pipeline_options) -> Dict:
+    """Compare scoring pairs chunk by chunk with the staged pipeline.
+
+    The sequential baseline runs `prepare_features_batch` and the forest on
+    each chunk in turn; the pipeline runs the same chunks through
+    `StagedPipeline(**pipeline_options)`. Both produce the same scores.
+
+    One chunk is first run both ways untimed, so neither side pays for the
+    models' first calls. The two then alternate for `repeats` rounds, and the
+    median round of each is reported.
+    """
+    if repeats < 1:
+        raise ValueError("repeats must be at least 1")
+    chunks = [
+        (candidates[offset:offset + chunk_size], jobs[offset:offset + chunk_size])
+        for offset in range(0, len(candidates), chunk_size)
+    ]
+    pipeline = StagedPipeline(**pipeline_options)
+
+    def _sequential(chunks):
+        timings = {}
+        start = time.perf_counter()
+        for chunk_candidates, chunk_jobs in chunks:
+            features = matcher.prepare_features_batch(
+                chunk_candidates, chunk_jobs, batch_size=pipeline.batch_size, timings=timings
+            )
+            matcher.predict_features(features)
+        return time.perf_counter() - start, timings
+
+    def _pipelined(chunks):
+        _, stats = pipeline.run(matcher, chunks)
+        return stats['seconds'], stats
+
+    _sequential(chunks[:1])
+    _pipelined(chunks[:1])
+
+    runs = {_sequential: [], _pipelined: []}
+    for round_number in range(repeats):
+        # Alternate which side goes first, so neither always follows the other
+        order = [_sequential, _pipelined] if round_number % 2 == 0 else [_pipelined, _sequential]
+        for run in order:
+            runs[run].append(run(chunks))
+
+    def _median(rounds):
+        return sorted(rounds, key=lambda result: result[0])[len(rounds) // 2]
+
+    sequential_seconds, timings = _median(runs[_sequential])
+    pipelined_seconds, stats = _median(runs[_pipelined])
+    return {
+        'pairs': len(candidates),
+        'chunks': len(chunks),
+        'repeats': repeats,
+        'sequential': {
+            'seconds': sequential_seconds,
+            'pairs_per_second': len(candidates) / sequential_seconds if sequential_seconds > 0 else 0.0,
+            'timings': timings,
+            'rounds': [seconds for seconds, _ in runs[_sequential]],
+        },
+        'pipelined': {**stats, 'rounds': [seconds for seconds, _ in runs[_pipelined]]},
+        'speedup': sequential_seconds / pipelined_seconds if pipelined_seconds > 0 else 0.0,
+    }
@@ -0,0 +1,402 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+from .hybrid_matcher import MixedDataProcessor
+from .skill_taxonomy import SkillTaxonomy
+
+
+class _SparseRows:
+    """Rows of a sparse matrix kept as CSR buffers that are patched after changes.
+
+    Writers only report which rows changed (`mark`) and how many rows there
+    are (`resize`). `update` then brings the buffers up to date: rows added at
+    the end are written into spare capacity, and when existing rows changed,
+    the unchanged rows are moved into fresh buffers with one vectorized copy,
+    so the Python-level work is proportional to the changed rows only.
+
+    Buffers are never written below the length of a matrix already returned
+    by `csr`, so callers may keep using one after releasing the index lock.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self._data = np.zeros(0, dtype=np.float64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        # Rows in the buffers, and rows the matrix should have
+        self._n_rows = 0
+        self._n_target = 0
+        # Rows in the buffers whose content changed since the last `update`
+        self._dirty = set()
+
+    def mark(self, row: int) -> None:
+        if row < self._n_rows:
+            self._dirty.add(row)
+
+    def resize(self, n_rows: int) -> None:
+        self._n_target = n_rows
+
+    def update(self, row_content) -> None:
+        """Apply the changes, reading rows as `row_content(row) -> (indices, values)`"""
+        if self._dirty or self._n_target < self._n_rows:
+            self._splice(min(self._n_rows, self._n_target), row_content)
+        if self._n_target > self._n_rows:
+            self._append(row_content)
+
+    def csr(self, n_columns: int) -> sparse.csr_matrix:
+        nnz = self._indptr[self._n_rows]
+        return sparse.csr_matrix(
+            (self._data[:nnz], self._indices[:nnz], self._indptr[:self._n_rows + 1]),
+            shape=(self._n_rows, n_columns)
+        )
+
+    def _splice(self, n_kept: int, row_content) -> None:
+        old_indptr = self._indptr[:n_kept + 1]
+        old_lengths = np.diff(old_indptr)
+        changed = np.array(sorted(row for row in self._dirty if row < n_kept), dtype=np.int64)
+        contents = [row_content(row) for row in changed]
+
+        lengths = old_lengths.copy()
+        lengths[changed] = [len(indices) for indices, _ in contents]
+        indptr = np.zeros(n_kept + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        data = self._grown(np.zeros(0, dtype=np.float64), indptr[-1])
+        indices = self._grown(np.zeros(0, dtype=np.int32), indptr[-1])
+
+        # Entries of unchanged rows move by however much their row's start moved
+        entry_rows = np.repeat(np.arange(n_kept), old_lengths)
+        unchanged = np.ones(n_kept, dtype=bool)
+        unchanged[changed] = False
+        source = np.flatnonzero(unchanged[entry_rows])
+        target = source + (indptr[:-1] - old_indptr[:-1])[entry_rows[source]]
+        data[target] = self._data[source]
+        indices[target] = self._indices[source]
+        for row, (row_indices, row_values) in zip(changed, contents):
+            data[indptr[row]:indptr[row + 1]] = row_values
+            indices[indptr[row]:indptr[row + 1]] = row_indices
+
+        self._data, self._indices = data, indices
+        self._indptr = self._grown(indptr, len(indptr))
+        self._n_rows = n_kept
+        self._dirty.clear()
+
+    def _append(self, row_content) -> None:
+        contents = [row_content(row) for row in range(self._n_rows, self._n_target)]
+        lengths = np.array([len(indices) for indices, _ in contents], dtype=np.int64)
+        start = self._indptr[self._n_rows]
+        end = start + lengths.sum()
+        self._data = self._grown(self._data, end, start)
+        self._indices = self._grown(self._indices, end, start)
+        self._indptr = self._grown(self._indptr, self._n_target + 1, self._n_rows + 1)
+        self._indptr[self._n_rows + 1:self._n_target + 1] = start + np.cumsum(lengths)
+        position = start
+        for row_indices, row_values in contents:
+            self._data[position:position + len(row_values)] = row_values
+            self._indices[position:position + len(row_indices)] = row_indices
+            position += len(row_indices)
+        self._n_rows = self._n_target
+
+    @staticmethod
+    def _grown(array: np.ndarray, size: int, used: int = None) -> np.ndarray:
+        """`array` with room for `size` entries; a new buffer (keeping the
+        first `used`) when it is too small, with spare capacity for appends"""
+        if len(array) >= size:
+            return array
+        used = len(array) if used is None else used
+        grown = np.empty(max(int(size), 2 * len(array), 16), dtype=array.dtype)
+        grown[:used] = array[:used]
+        return grown
+
+
+class ProfileIndex:
+    """Incrementally updated store of preprocessed profiles (job postings or candidates).
+
+    Each profile is featurized once when it is added: its structured features,
+    extracted skills (as term counts for TF-IDF scoring and, once a model's
+    taxonomy asks for them, as skill IDs for skill overlap) and its
+    L2-normalized embedding are kept in column arrays so one query can be
+    scored against all profiles in a single vectorized pass. Removal swaps the last row into the
+    freed slot, so both upserts and removals are O(1) apart from buffer growth.
+    The sparse term count and skill matrices are patched on the next query
+    rather than rebuilt, with Python-level work only for the changed rows.
+    """
+
+    STRUCTURED_FIELDS = ('years_experience', 'education_level', 'location_match')
+
+    def __init__(self, processor: MixedDataProcessor = None, capacity: int = 1024):
+        self.processor = processor
+        self.lock = threading.RLock()
+        self.vocabulary = {}
+        # Hashes of the source fields each profile was featurized from (see change_feed)
+        self.source_hashes = {}
+        self._ids = []
+        self._positions = {}
+        self._skills = []
+        self._terms = []
+        self._skill_taxonomy = None
+        # IDs of skills `_skill_taxonomy` does not know, local to this index
+        self._skill_extension = {}
+        self._structured = {
+            field: np.zeros(capacity, dtype=np.float32) for field in self.STRUCTURED_FIELDS
+        }
+        self._embeddings = None
+        self._capacity = capacity
+        # Term counts and skill IDs (under `_skill_taxonomy`) as sparse rows, patched after changes
+        self._term_rows = _SparseRows()
+        self._skill_rows = _SparseRows()
+        # Bumped by every change; `save` records the version it wrote
+        self._version = 0
+        self._saved_version = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, profile_id) -> bool:
+        return profile_id in self._positions
+
+    @property
+    def ids(self) -> List:
+        return list(self._ids)
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the index has changed since it was loaded or last saved"""
+        return self._version != self._saved_version
+
+    def upsert(self, profile_id, profile_data: Dict) -> None:
+        """Featurize a raw profile ({'structured': ..., 'unstructured': ...}) and store it"""
+        structured = self.processor.process_structured_data(profile_data.get('structured', {}))
+        info, embedding = self.processor.process_unstructured_data(profile_data.get('unstructured', ''))
+        self.upsert_features(profile_id, structured, info['skills'], embedding)
+
+    def upsert_features(self, profile_id, structured: Dict, skills: List[str], embedding: np.ndarray,
+                        source_hashes: Dict[str, str] = None) -> None:
+        """Store already computed features for a profile, replacing any previous version"""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if norm > 0:
+            embedding = embedding / norm
+        terms = self.processor.skill_terms(skills)
+
+        with self.lock:
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self._capacity, embedding.shape[0]), dtype=np.float32)
+            self._ensure_writable()
+
+            row = self._positions.get(profile_id)
+            if row is None:
+                row = len(self._ids)
+                if row == self._capacity:
+                    self._grow()
+                self._ids.append(profile_id)
+                self._skills.append(None)
+                self._terms.append(None)
+                self._positions[profile_id] = row
+
+            for field in self.STRUCTURED_FIELDS:
+                self._structured[field][row] = structured.get(field, 0.0)
+            self._embeddings[row] = embedding
+            self._skills[row] = list(skills)
+            self._terms[row] = self._count_terms(terms, self.vocabulary)
+            self._mark_rows(row)
+            self._version += 1
+            if source_hashes is not None:
+                self.source_hashes[profile_id] = source_hashes
+            else:
+                self.source_hashes.pop(profile_id, None)
+
+    def remove(self, profile_id) -> bool:
+        """Remove a profile; returns False if it was not indexed"""
+        with self.lock:
+            row = self._positions.pop(profile_id, None)
+            if row is None:
+                return False
+            self.source_hashes.pop(profile_id, None)
+
+            self._ensure_writable()
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._ids[row] = moved_id
+                self._skills[row] = self._skills[last]
+                self._terms[row] = self._terms[last]
+                for field in self.STRUCTURED_FIELDS:
+                    self._structured[field][row] = self._structured[field][last]
+                self._embeddings[row] = self._embeddings[last]
+                self._positions[moved_id] = row
+
+            self._ids.pop()
+            self._skills.pop()
+            self._terms.pop()
+            self._mark_rows(row)
+            self._version += 1
+            return True
+
+    def get_features(self, profile_id) -> Tuple[Dict, List[str], np.ndarray]:
+        """Return (structured features, skills, normalized embedding) for a profile"""
+        with self.lock:
+            row = self._positions[profile_id]
+            structured = {field: float(self._structured[field][row]) for field in self.STRUCTURED_FIELDS}
+            return structured, list(self._skills[row]), self._embeddings[row].copy()
+
+    def gather(self, profile_ids: List) -> Dict:
+        """Column-wise features for the given profiles, in the layout taken by
+        `HybridMatcher.prepare_features_columns`"""
+        with self.lock:
+            rows = np.array([self._positions[profile_id] for profile_id in profile_ids], dtype=np.int64)
+            columns = {field: values[rows].astype(np.float64) for field, values in self._structured.items()}
+            columns['skills'] = [self._skills[row] for row in rows]
+            columns['embedding'] = self._embeddings[rows] if len(rows) else np.zeros((0, 0), dtype=np.float32)
+        return columns
+
+    def structured_arrays(self) -> Dict[str, np.ndarray]:
+        """Structured feature columns for all indexed profiles, in row order.
+        
+        These are views of the index's buffers: read them under `lock`, and copy
+        them to use them after releasing it.
+        """
+        n = len(self._ids)
+        return {field: values[:n] for field, values in self._structured.items()}
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """L2-normalized embedding matrix for all indexed profiles, in row order"""
+        if self._embeddings is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._embeddings[:len(self._ids)]
+
+    def term_counts(self, n_columns: int = None) -> sparse.csr_matrix:
+        """Skill term counts as a CSR matrix over `vocabulary`, patched after changes"""
+        with self.lock:
+            self._term_rows.update(lambda row: self._terms[row])
+            return self._term_rows.csr(max(n_columns or 0, len(self.vocabulary)))
+
+    def skill_matrix(self, taxonomy: SkillTaxonomy) -> Tuple[sparse.csr_matrix, Dict[str, int]]:
+        """Binary profile x skill ID matrix over `taxonomy`, patched after changes.
+        
+        Skills the taxonomy does not know get columns past its end, recorded in
+        the returned extension (a copy, which the caller may extend with the
+        query's own unknown skills). Only rows changed since the last call are
+        mapped again, unless the taxonomy itself changed (a new model).
+        """
+        def row_content(row):
+            skill_ids = taxonomy.to_ids(self._skills[row], self._skill_extension)
+            return skill_ids, np.ones(len(skill_ids))
+
+        with self.lock:
+            if self._skill_taxonomy is not taxonomy:
+                self._skill_taxonomy = taxonomy
+                self._skill_extension = {}
+                self._skill_rows.clear()
+                self._skill_rows.resize(len(self._ids))
+            self._skill_rows.update(row_content)
+            matrix = self._skill_rows.csr(len(taxonomy) + len(self._skill_extension))
+            return matrix, dict(self._skill_extension)
+
+    def _mark_rows(self, row: int) -> None:
+        """Record that `row` changed (or was removed) for the sparse row matrices"""
+        for rows in (self._term_rows, self._skill_rows):
+            rows.mark(row)
+            rows.resize(len(self._ids))
+
+    def query_term_counts(self, skills: List[str]) -> sparse.csr_matrix:
+        """Term counts for a query's skills; unseen terms get columns past the vocabulary"""
+        with self.lock:
+            vocabulary = dict(self.vocabulary)
+        indices, counts = self._count_terms(self.processor.skill_terms(skills), vocabulary)
+        return sparse.csr_matrix(
+            (counts, indices, np.array([0, len(indices)])), shape=(1, len(vocabulary))
+        )
+
+    @staticmethod
+    def _count_terms(terms: List[str], vocabulary: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+        counts = {}
+        for term in terms:
+            term_id = vocabulary.setdefault(term, len(vocabulary))
+            counts[term_id] = counts.get(term_id, 0) + 1
+        indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        order = np.argsort(indices)
+        return indices[order], values[order]
+
+    def share(self, store, key: str) -> None:
+        """Move the embedding matrix into a `SharedArrayStore` and read it from there.
+        
+        The shared matrix is read-only; the first upsert or removal afterwards
+        takes a private copy again, which other processes do not see. Processes
+        sharing an index should only read it and reload it when its single
+        writer saves a new version.
+        """
+        with self.lock:
+            if self._embeddings is None or not self._ids:
+                return
+            self._embeddings = store.publish(f"{key}.embeddings", self.embeddings)
+            self._capacity = len(self._ids)
+            self._structured = {field: values[:self._capacity] for field, values in self._structured.items()}
+            
+    def _ensure_writable(self) -> None:
+        if not self._embeddings.flags.writeable:
+            self._embeddings = np.array(self._embeddings)
+            
+    def _grow(self) -> None:
+        self._capacity *= 2
+        for field, values in self._structured.items():
+            grown = np.zeros(self._capacity, dtype=values.dtype)
+            grown[:len(values)] = values
+            self._structured[field] = grown
+        grown = np.zeros((self._capacity, self._embeddings.shape[1]), dtype=self._embeddings.dtype)
+        grown[:len(self._embeddings)] = self._embeddings
+        self._embeddings = grown
+
+    def save(self, path: str) -> None:
+        """Save the index to disk.
+
+        The index is written to a temporary file that then replaces `path`, so
+        readers never load a partially written index.
+        """
+        with self.lock:
+            version = self._version
+            n = len(self._ids)
+            index_data = {
+                'ids': list(self._ids),
+                'skills': list(self._skills),
+                'terms': list(self._terms),
+                'vocabulary': dict(self.vocabulary),
+                'source_hashes': dict(self.source_hashes),
+                'structured': {field: values[:n].copy() for field, values in self._structured.items()},
+                'embeddings': self.embeddings.copy(),
+            }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(index_data, tmp_path)
+        os.replace(tmp_path, path)
+        self._saved_version = version
+
+    @classmethod
+    def load(cls, path: str, processor: MixedDataProcessor = None) -> 'ProfileIndex':
+        """Load an index from disk"""
+        index_data = joblib.load(path)
+        n = len(index_data['ids'])
+        index = cls(processor, capacity=max(n, 1024))
+        index.vocabulary = index_data['vocabulary']
+        index.source_hashes = index_data.get('source_hashes', {})
+        index._ids = index_data['ids']
+        index._positions = {profile_id: row for row, profile_id in enumerate(index._ids)}
+        index._skills = index_data['skills']
+        index._terms = index_data['terms']
+        # The sparse row matrices, including the skill IDs of the model's
+        # taxonomy, are built on first use rather than saved
+        index._term_rows.resize(n)
+        index._skill_rows.resize(n)
+        for field, values in index_data['structured'].items():
+            index._structured[field][:n] = values
+        if index_data['embeddings'].size:
+            index._embeddings = np.zeros((index._capacity, index_data['embeddings'].shape[1]), dtype=np.float32)
+            index._embeddings[:n] = index_data['embeddings']
+        return index
@@ -0,0 +1,147 @@
+import os
+import re
+import tempfile
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class SharedArrayStore:
+    """Read-only numpy arrays shared between processes through memory-mapped files.
+
+    The first process to publish a key writes the array to `directory` as a
+    .npy file; every process, including the first, then maps that file
+    read-only. The pages are held once by the OS no matter how many workers
+    attach. Published files are never rewritten, so keys must change when the
+    content does (see `file_cache_key`), and arrays of keys that are no longer
+    used have to be removed with `release` or `prune`. Removing a file does not
+    affect processes that already mapped it.
+    """
+
+    def __init__(self, directory: str = None):
+        if directory is None:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            directory = os.path.join(base, 'candidate-job-matching')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    @staticmethod
+    def _file_stem(key: str) -> str:
+        return re.sub(r'[^\w.-]', '_', key)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, self._file_stem(key) + '.npy')
+
+    def publish(self, key: str, array: np.ndarray) -> np.ndarray:
+        """Write `array` under `key` unless it already exists, then attach to it"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            # Write under a private name first so other workers never map a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+        try:
+            return self.attach(key)
+        except FileNotFoundError:
+            # Released by another process between our check and the mapping
+            return self.publish(key, array)
+
+    def attach(self, key: str) -> np.ndarray:
+        """Map a published array read-only"""
+        return np.load(self._path(key), mmap_mode='r')
+
+    def release(self, prefix: str) -> int:
+        """Remove the arrays published under `prefix` (e.g. a `file_cache_key`).
+
+        Covers every key of the form `<prefix>.<name>`; returns how many files
+        were removed.
+        """
+        return self._remove(lambda stem: stem.startswith(self._file_stem(prefix) + '.'))
+
+    def prune(self, prefix: str, keep=()) -> int:
+        """Remove arrays whose key starts with `prefix`, except those released
+        by one of the `keep` prefixes"""
+        keep = tuple(self._file_stem(key) + '.' for key in keep)
+        return self._remove(
+            lambda stem: stem.startswith(self._file_stem(prefix)) and not stem.startswith(keep)
+        )
+
+    def _remove(self, matches) -> int:
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy') and matches(name[:-len('.npy')]):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """(mtime, size, inode) of a file, or None if it does not exist.
+
+    Files replaced with `os.replace` get a new inode, so this also changes when
+    a rewrite keeps the size and lands within the same mtime tick.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def file_cache_key(path: str) -> str:
+    """Key that changes whenever the file at `path` is rewritten"""
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def watch_file(path: str, on_change: Callable[[], None], stop: threading.Event,
+               interval: float = 5.0) -> threading.Thread:
+    """Call `on_change()` from a daemon thread whenever the file at `path` changes.
+
+    A change is only acted on once the file's signature is unchanged across two
+    polls, so a file that is still being written is not picked up. The thread
+    runs until `stop` is set.
+    """
+    def _watch():
+        loaded = file_signature(path)
+        previous = loaded
+        while not stop.wait(interval):
+            current = file_signature(path)
+            if current is not None and current != loaded and current == previous:
+                loaded = current
+                on_change()
+            previous = current
+
+    thread = threading.Thread(target=_watch, daemon=True)
+    thread.start()
+    return thread
+
+
+def memory_usage() -> Dict[str, int]:
+    """Resident memory of this process in bytes.
+
+    `pss` (proportional set size) splits shared pages between the processes
+    mapping them, so it is the figure that drops when workers share arrays.
+    """
+    usage = {}
+    fields = {'VmRSS': 'rss', 'RssFile': 'rss_file', 'RssShmem': 'rss_shmem', 'Pss': 'pss'}
+    for proc_file in ('/proc/self/status', '/proc/self/smaps_rollup'):
+        try:
+            with open(proc_file) as f:
+                for line in f:
+                    name, _, rest = line.partition(':')
+                    if name in fields and fields[name] not in usage:
+                        usage[fields[name]] = int(rest.split()[0]) * 1024
+        except OSError:
+            continue
+
+    if 'rss' not in usage:
+        import resource
+        # Peak rather than current RSS; ru_maxrss is in kilobytes on Linux
+        usage['rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return usage
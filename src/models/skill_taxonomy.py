@@ -0,0 +1,214 @@
+from typing import Dict, Iterable, List
+
+import numpy as np
+from scipy import sparse
+
+# Common alternative spellings, mapped to the canonical (normalized) skill name
+DEFAULT_ALIASES = {
+    'js': 'javascript',
+    'node': 'node.js',
+    'nodejs': 'node.js',
+    'postgres': 'postgresql',
+    'k8s': 'kubernetes',
+    'ml': 'machine learning',
+    'rest': 'rest api',
+    'golang': 'go',
+    'amazon web services': 'aws',
+}
+
+
+class SkillTaxonomy:
+    """Maps skill names to integer IDs.
+
+    Names are normalized (case, whitespace, trailing punctuation, aliases)
+    before lookup. The taxonomy is built from the training profiles and saved
+    with the model, and is read-only afterwards, so its IDs and size stay fixed
+    while it is shared by request threads. Skills it does not know get IDs past
+    its end from a caller-owned `extension` dict instead (see `to_ids`).
+
+    A profile's skills are stored as a sorted array of IDs and many profiles as
+    a binary CSR matrix with one column per skill, which turns skill overlap
+    into sparse products.
+    """
+
+    def __init__(self, skills: Iterable[str] = (), aliases: Dict[str, str] = None):
+        self.ids = {}
+        self.names = []
+        aliases = DEFAULT_ALIASES if aliases is None else aliases
+        self.aliases = {self._clean(alias): self._clean(name) for alias, name in aliases.items()}
+        for skill in skills:
+            name = self.normalize(skill)
+            if name and name not in self.ids:
+                self.ids[name] = len(self.names)
+                self.names.append(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _clean(skill: str) -> str:
+        return ' '.join(skill.lower().split()).strip(' .,;:')
+
+    def normalize(self, skill: str) -> str:
+        name = self._clean(skill)
+        return self.aliases.get(name, name)
+
+    def to_ids(self, skills: Iterable[str], extension: Dict[str, int] = None) -> np.ndarray:
+        """Sorted, de-duplicated IDs for a list of skill names.
+
+        Skills missing from the taxonomy get IDs from `len(self)` upwards,
+        recorded in `extension` (normalized name -> ID), which is updated in
+        place. Skill lists whose IDs are compared must share one `extension`.
+        """
+        extension = {} if extension is None else extension
+        ids = set()
+        for skill in skills:
+            name = self.normalize(skill)
+            if not name:
+                continue
+            skill_id = self.ids.get(name)
+            if skill_id is None:
+                skill_id = extension.setdefault(name, len(self.names) + len(extension))
+            ids.add(skill_id)
+        return np.array(sorted(ids), dtype=np.int32)
+
+    def matrix(self, id_lists: List[np.ndarray], n_columns: int = None) -> sparse.csr_matrix:
+        """Binary profile x skill matrix from per-profile ID arrays"""
+        indptr = np.concatenate([[0], np.cumsum([len(ids) for ids in id_lists])]).astype(np.int64)
+        indices = np.concatenate(list(id_lists) or [np.zeros(0, dtype=np.int32)]).astype(np.int32)
+        shape = (len(id_lists), max(n_columns or 0, len(self)))
+        return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=shape)
+
+
+class SkillWeights:
+    """IDF-style skill weights fitted on a corpus of profiles, keyed by skill name.
+
+    Rare skills weigh more in the weighted coverage feature. Weights are kept
+    by normalized name so they can be saved with a model and applied to any
+    taxonomy; skills not seen while fitting get the weight of the rarest skill.
+    Unfitted weights are all 1.
+    """
+
+    def __init__(self):
+        self.document_frequency = {}
+        self.n_documents = 0
+        self._cache = None
+
+    def fit(self, skill_lists: Iterable[Iterable[str]], taxonomy: SkillTaxonomy) -> 'SkillWeights':
+        document_frequency = {}
+        n_documents = 0
+        for skills in skill_lists:
+            n_documents += 1
+            for name in {taxonomy.normalize(skill) for skill in skills}:
+                document_frequency[name] = document_frequency.get(name, 0) + 1
+        self.document_frequency = document_frequency
+        self.n_documents = n_documents
+        self._cache = None
+        return self
+
+    def matches(self, other: 'SkillWeights') -> bool:
+        """Whether both give every skill the same weight"""
+        return (self.n_documents == other.n_documents
+                and self.document_frequency == other.document_frequency)
+
+    @property
+    def unseen_weight(self) -> float:
+        """Weight of a skill that no fitted profile had"""
+        return float(np.log(1 + self.n_documents) + 1) if self.n_documents else 1.0
+
+    def vector(self, taxonomy: SkillTaxonomy, n_columns: int = None) -> np.ndarray:
+        """Weights aligned with the taxonomy's IDs.
+
+        Columns past the taxonomy (IDs from a `to_ids` extension) get
+        `unseen_weight`. The taxonomy's own part is computed once per taxonomy.
+        """
+        cache = self._cache
+        if cache is not None and cache[0] is taxonomy:
+            weights = cache[1]
+        else:
+            if self.n_documents == 0:
+                weights = np.ones(len(taxonomy))
+            else:
+                frequency = np.array([self.document_frequency.get(name, 0) for name in taxonomy.names],
+                                     dtype=np.float64)
+                weights = np.log((1 + self.n_documents) / (1 + frequency)) + 1
+            self._cache = (taxonomy, weights)
+
+        n_extra = (n_columns or 0) - len(weights)
+        if n_extra > 0:
+            weights = np.concatenate([weights, np.full(n_extra, self.unseen_weight)])
+        return weights
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = None
+        return state
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+def _with_columns(matrix: sparse.csr_matrix, n_columns: int) -> sparse.csr_matrix:
+    if matrix.shape[1] >= n_columns:
+        return matrix
+    return sparse.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], n_columns))
+
+
+def skill_overlap_features(candidate_skills: sparse.csr_matrix, job_skills: sparse.csr_matrix,
+                           weights: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """Skill features for aligned rows of binary candidate and job skill matrices.
+
+    - `skill_overlap`: share of the job's skills the candidate has
+    - `skill_jaccard`: shared skills over all skills of either side
+    - `skill_weighted_coverage`: like `skill_overlap`, with skills weighted by `weights`
+      (all 1 when not given)
+    """
+    weights = np.zeros(0) if weights is None else weights
+    n_columns = max(candidate_skills.shape[1], job_skills.shape[1], len(weights))
+    candidate_skills = _with_columns(candidate_skills, n_columns)
+    job_skills = _with_columns(job_skills, n_columns)
+    weights = np.pad(weights, (0, n_columns - len(weights)), constant_values=1.0)
+
+    shared = candidate_skills.multiply(job_skills).tocsr()
+    n_shared = np.asarray(shared.sum(axis=1)).ravel()
+    n_candidate = np.diff(candidate_skills.indptr)
+    n_job = np.diff(job_skills.indptr)
+    return {
+        'skill_overlap': _ratio(n_shared, n_job),
+        'skill_jaccard': _ratio(n_shared, n_candidate + n_job - n_shared),
+        'skill_weighted_coverage': _ratio(shared @ weights, job_skills @ weights),
+    }
+
+
+def skill_overlap_one_to_many(query_ids: np.ndarray, profile_skills: sparse.csr_matrix, weights: np.ndarray = None,
+                              query_is_job: bool = True) -> Dict[str, np.ndarray]:
+    """The features of `skill_overlap_features` for one profile against many.
+
+    Everything reduces to sparse matrix-vector products with the query's skill
+    indicator, so the cost is linear in the number of stored skill entries.
+    """
+    weights = np.zeros(0) if weights is None else weights
+    n_columns = max(profile_skills.shape[1], int(query_ids.max()) + 1 if len(query_ids) else 0, len(weights))
+    profile_skills = _with_columns(profile_skills, n_columns)
+    weights = np.pad(weights, (0, n_columns - len(weights)), constant_values=1.0)
+
+    indicator = np.zeros(n_columns)
+    indicator[query_ids] = 1.0
+    n_shared = profile_skills @ indicator
+    shared_weight = profile_skills @ (indicator * weights)
+    n_profile = np.diff(profile_skills.indptr)
+    n_query = len(query_ids)
+
+    if query_is_job:
+        n_job, job_weight = n_query, weights[query_ids].sum()
+    else:
+        n_job, job_weight = n_profile, profile_skills @ weights
+    n_job = np.broadcast_to(n_job, n_shared.shape)
+    return {
+        'skill_overlap': _ratio(n_shared, n_job),
+        'skill_jaccard': _ratio(n_shared, n_profile + n_query - n_shared),
+        'skill_weighted_coverage': _ratio(shared_weight, np.broadcast_to(job_weight, n_shared.shape)),
+    }
@@ -0,0 +1,197 @@
+"""Checks that ProfileChangeFeed re-featurizes only the fields that changed,
+using a stub processor that counts the work it is asked to do.
+
+Run with `python -m pytest src/test_change_feed.py` or `python src/test_change_feed.py`.
+"""
+import numpy as np
+
+from models.change_feed import ProfileChangeFeed
+from models.profile_index import ProfileIndex
+
+
+class CountingProcessor:
+    """Stands in for MixedDataProcessor: skills are the words of the text"""
+
+    def __init__(self):
+        self.structured_calls = 0
+        self.text_batches = []
+
+    def process_structured_data(self, data):
+        self.structured_calls += 1
+        return {'years_experience': float(data.get('years_experience', 0)),
+                'education_level': 0.0, 'location_match': 0.0}
+
+    def process_unstructured_batch(self, texts, batch_size=64, timings=None, n_process=1):
+        self.text_batches.append(list(texts))
+        infos = [{'skills': text.split(), 'experience': 0.0, 'education': 'Unknown'} for text in texts]
+        embeddings = np.array([[len(text) + 1.0, sum(map(ord, text)) % 97 + 1.0, 1.0] for text in texts])
+        return infos, embeddings
+
+    def skill_terms(self, skills):
+        return [skill.lower() for skill in skills]
+
+    @property
+    def texts(self):
+        return [text for batch in self.text_batches for text in batch]
+
+
+def _feed(batch_size=256):
+    processor = CountingProcessor()
+    feed = ProfileChangeFeed(processor, {'job': ProfileIndex(processor), 'candidate': ProfileIndex(processor)},
+                             batch_size=batch_size)
+    return feed, processor
+
+
+def _upsert(profile_id, structured=None, text=None, kind='job'):
+    data = {}
+    if structured is not None:
+        data['structured'] = structured
+    if text is not None:
+        data['unstructured'] = text
+    return {'op': 'upsert', 'kind': kind, 'id': profile_id, 'data': data}
+
+
+def _delete(profile_id, kind='job'):
+    return {'op': 'delete', 'kind': kind, 'id': profile_id}
+
+
+def _counters(feed):
+    return {name: feed.stats[name] for name in
+            ('upserts', 'deletes', 'unchanged', 'structured_recomputed', 'text_recomputed')}
+
+
+def test_new_profiles_are_featurized_once_per_distinct_text():
+    feed, processor = _feed()
+    feed.apply([
+        _upsert('J1', {'years_experience': 3}, 'Python SQL'),
+        _upsert('J2', {'years_experience': 5}, 'Python SQL'),
+        _upsert('C1', {'years_experience': 4}, 'Java', kind='candidate'),
+    ])
+    assert _counters(feed) == {'upserts': 3, 'deletes': 0, 'unchanged': 0,
+                               'structured_recomputed': 3, 'text_recomputed': 3}
+    # One batch call, with each distinct text once
+    assert processor.text_batches == [['Python SQL', 'Java']]
+    assert processor.structured_calls == 3
+    structured, skills, _ = feed.indexes['job'].get_features('J2')
+    assert structured['years_experience'] == 5.0 and sorted(skills) == ['Python', 'SQL']
+    assert feed.indexes['candidate'].ids == ['C1']
+
+
+def test_replay_does_no_work():
+    events = [_upsert('J1', {'years_experience': 3}, 'Python SQL'), _upsert('J2', {}, 'Go')]
+    feed, processor = _feed()
+    feed.apply(events)
+    before = (processor.structured_calls, len(processor.texts), feed.indexes['job']._version)
+    feed.apply(events)
+    assert (processor.structured_calls, len(processor.texts), feed.indexes['job']._version) == before
+    assert feed.stats['unchanged'] == 2
+    assert feed.stats['upserts'] == 2
+
+
+def test_only_the_changed_field_is_recomputed():
+    feed, processor = _feed()
+    feed.apply([_upsert('J1', {'years_experience': 3}, 'Python SQL')])
+    _, _, embedding = feed.indexes['job'].get_features('J1')
+
+    # Structured data changed, text identical: no text processing
+    feed.apply([_upsert('J1', {'years_experience': 7}, 'Python SQL')])
+    assert processor.texts == ['Python SQL']
+    structured, skills, new_embedding = feed.indexes['job'].get_features('J1')
+    assert structured['years_experience'] == 7.0 and sorted(skills) == ['Python', 'SQL']
+    np.testing.assert_allclose(new_embedding, embedding, rtol=1e-6)
+
+    # Text changed, structured identical: no structured processing
+    calls = processor.structured_calls
+    feed.apply([_upsert('J1', {'years_experience': 7}, 'Rust')])
+    assert processor.structured_calls == calls
+    assert processor.texts == ['Python SQL', 'Rust']
+    structured, skills, _ = feed.indexes['job'].get_features('J1')
+    assert structured['years_experience'] == 7.0 and skills == ['Rust']
+    assert _counters(feed) == {'upserts': 3, 'deletes': 0, 'unchanged': 0,
+                               'structured_recomputed': 2, 'text_recomputed': 2}
+
+
+def test_partial_upserts_keep_omitted_fields():
+    feed, processor = _feed()
+    feed.apply([_upsert('J1', {'years_experience': 3}, 'Python SQL')])
+
+    feed.apply([_upsert('J1', structured={'years_experience': 4})])
+    feed.apply([_upsert('J1', text='Docker')])
+    structured, skills, _ = feed.indexes['job'].get_features('J1')
+    assert structured['years_experience'] == 4.0 and skills == ['Docker']
+    assert processor.texts == ['Python SQL', 'Docker']
+    assert processor.structured_calls == 2
+
+    # Omitting a field leaves its stored hash in place, so replaying the full
+    # profile afterwards does no work
+    feed.apply([_upsert('J1', {'years_experience': 4}, 'Docker')])
+    assert feed.stats['unchanged'] == 1
+
+
+def test_partial_upserts_merge_within_a_batch():
+    feed, processor = _feed()
+    feed.apply([_upsert('J1', {'years_experience': 3}, 'Python SQL')])
+    feed.apply([
+        _upsert('J1', structured={'years_experience': 9}),
+        _upsert('J1', text='Kubernetes'),
+    ])
+    structured, skills, _ = feed.indexes['job'].get_features('J1')
+    assert structured['years_experience'] == 9.0 and skills == ['Kubernetes']
+    # The two events were applied as one update
+    assert feed.stats['upserts'] == 2
+    assert processor.text_batches == [['Python SQL'], ['Kubernetes']]
+
+
+def test_delete_then_recreate_in_one_batch_starts_fresh():
+    feed, processor = _feed()
+    feed.apply([_upsert('J1', {'years_experience': 3}, 'Python SQL')])
+    # Re-created with only structured data: the old text must not carry over
+    feed.apply([_delete('J1'), _upsert('J1', structured={'years_experience': 3})])
+    structured, skills, _ = feed.indexes['job'].get_features('J1')
+    assert structured['years_experience'] == 3.0 and skills == []
+    assert feed.stats['structured_recomputed'] == 2
+    assert feed.stats['text_recomputed'] == 2
+    assert processor.texts == ['Python SQL', '']
+
+    # Re-created with the same data it had: recomputed rather than skipped
+    feed.apply([_delete('J1'), _upsert('J1', {'years_experience': 3})])
+    assert feed.stats['unchanged'] == 0
+    assert feed.stats['upserts'] == 3
+
+
+def test_upsert_then_delete_in_one_batch_removes_the_profile():
+    feed, processor = _feed()
+    feed.apply([_upsert('J1', {'years_experience': 3}, 'Python SQL')])
+    feed.apply([_upsert('J1', text='Go'), _delete('J1'), _delete('J2')])
+    assert 'J1' not in feed.indexes['job']
+    assert feed.stats['deletes'] == 1
+    assert processor.texts == ['Python SQL']
+
+
+def test_idle_ticks_flush_and_notify():
+    feed, _ = _feed(batch_size=10)
+    flushed, idle = [], []
+    feed.apply(
+        [_upsert('J1', {}, 'Go'), None, None, _upsert('J2', {}, 'Rust')],
+        on_flush=lambda stats: flushed.append(stats['upserts']),
+        on_idle=lambda: idle.append(len(feed.indexes['job']))
+    )
+    # The first tick flushed J1 before notifying; J2 was flushed at the end
+    assert flushed == [1, 2]
+    assert idle == [1, 1]
+
+
+def main():
+    test_new_profiles_are_featurized_once_per_distinct_text()
+    test_replay_does_no_work()
+    test_only_the_changed_field_is_recomputed()
+    test_partial_upserts_keep_omitted_fields()
+    test_partial_upserts_merge_within_a_batch()
+    test_delete_then_recreate_in_one_batch_starts_fresh()
+    test_upsert_then_delete_in_one_batch_removes_the_profile()
+    test_idle_ticks_flush_and_notify()
+    print("ProfileChangeFeed recomputes only what changed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Checks that SingleFlight.do_many shares in-flight work between overlapping
+batches and computes each missing key once.
+
+Run with `python -m pytest src/test_coalescing.py` or `python src/test_coalescing.py`.
+"""
+import threading
+import time
+
+from models.coalescing import SingleFlight
+
+
+def _start(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_overlapping_batches_share_keys():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    computed = {'first': [], 'second': []}
+    results = {}
+
+    def first_batch(positions):
+        computed['first'].append(positions)
+        started.set()
+        release.wait(5)
+        return [f"first:{key}" for key in ('x', 'y')]
+
+    second_computed = threading.Event()
+
+    def second_batch(positions):
+        computed['second'].append(positions)
+        second_computed.set()
+        return ['second:z' for _ in positions]
+
+    first = _start(lambda: results.update(first=flight.do_many(['x', 'y'], first_batch)))
+    assert started.wait(5)
+    second = _start(lambda: results.update(second=flight.do_many(['y', 'z'], second_batch)))
+    # The second batch computes its own key without waiting for the first batch
+    assert second_computed.wait(5)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results['first'] == ['first:x', 'first:y']
+    assert results['second'] == ['first:y', 'second:z']
+    assert computed == {'first': [[0, 1]], 'second': [[1]]}
+    assert flight.stats()['calls'] == 4
+    assert flight.stats()['deduplicated'] == 1
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_errors_reach_waiting_batches():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def failing_batch(positions):
+        started.set()
+        release.wait(5)
+        raise RuntimeError("model failed")
+
+    def record_error(fn):
+        try:
+            fn()
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = _start(lambda: record_error(lambda: flight.do_many(['x'], failing_batch)))
+    assert started.wait(5)
+    follower = _start(lambda: record_error(lambda: flight.do_many(['x'], lambda positions: ['unused'])))
+    while flight.stats()['deduplicated'] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert errors == ["model failed", "model failed"]
+    assert flight.stats()['in_flight'] == 0
+
+
+def main():
+    test_overlapping_batches_share_keys()
+    test_errors_reach_waiting_batches()
+    print("SingleFlight.do_many shares in-flight keys between batches.")
+
+
+if __name__ == "__main__":
+    main()
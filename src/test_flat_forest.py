@@ -0,0 +1,98 @@
+"""Checks that FlatForest, which replaces the random forest when arrays are
+shared between workers, predicts and explains exactly like the forest it was
+flattened from.
+
+Run with `python -m pytest src/test_flat_forest.py` or `python src/test_flat_forest.py`.
+"""
+import tempfile
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from models.flat_forest import FlatForest
+from models.shared_arrays import SharedArrayStore
+
+N_FEATURES = 9
+
+
+def _fitted_forest(seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(500, N_FEATURES).astype(np.float32)
+    # Discrete columns put many rows right next to split thresholds
+    X[:, 3] = np.round(X[:, 3] * 10)
+    X[:, 4] = rng.randint(0, 5, size=len(X))
+    y = X[:, 0] * 0.5 + X[:, 1] * X[:, 2] + (X[:, 4] >= 2) * 0.3 + rng.normal(0, 0.05, len(X))
+    forest = RandomForestRegressor(n_estimators=25, max_depth=8, random_state=seed).fit(X, y)
+    return forest, X
+
+
+def _test_rows(X_train, seed=1):
+    rng = np.random.RandomState(seed)
+    X_new = rng.rand(200, N_FEATURES).astype(np.float32)
+    X_new[:, 3] = np.round(X_new[:, 3] * 10)
+    X_new[:, 4] = rng.randint(0, 5, size=len(X_new))
+    return np.vstack([X_train[:200], X_new])
+
+
+def test_predict_matches_sklearn():
+    forest, X_train = _fitted_forest()
+    X = _test_rows(X_train)
+    flat = FlatForest.from_forest(forest)
+    np.testing.assert_allclose(flat.predict(X), forest.predict(X), rtol=1e-12, atol=1e-12)
+    # float64 input is compared against thresholds the same way as sklearn does
+    np.testing.assert_allclose(flat.predict(X.astype(np.float64)), forest.predict(X.astype(np.float64)),
+                               rtol=1e-12, atol=1e-12)
+    np.testing.assert_array_equal(flat.feature_importances_, forest.feature_importances_)
+
+
+def test_chunked_predict_matches_sklearn():
+    forest, X_train = _fitted_forest(seed=4)
+    X = _test_rows(X_train)
+    expected = forest.predict(X)
+    flat = FlatForest.from_forest(forest)
+    # Down to one row per chunk, and chunks that do not divide the rows evenly
+    for chunk_nodes in (1, forest.n_estimators * 7, forest.n_estimators * 64):
+        flat.chunk_nodes = chunk_nodes
+        np.testing.assert_allclose(flat.predict(X), expected, rtol=1e-12, atol=1e-12)
+    assert flat.predict(X[:0]).shape == (0,)
+
+
+def test_shared_predict_matches_sklearn():
+    forest, X_train = _fitted_forest(seed=2)
+    X = _test_rows(X_train)
+    with tempfile.TemporaryDirectory() as directory:
+        store = SharedArrayStore(directory)
+        shared = FlatForest.from_forest(forest).share(store, 'test-forest')
+        attached = FlatForest({name: store.attach(f"test-forest.{name}") for name in shared.arrays})
+        np.testing.assert_allclose(shared.predict(X), forest.predict(X), rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(attached.predict(X), forest.predict(X), rtol=1e-12, atol=1e-12)
+        assert store.release('test-forest') == len(shared.arrays)
+
+
+def test_shap_values_match_sklearn():
+    try:
+        import shap
+    except ImportError:
+        print("shap is not installed; skipping the SHAP comparison")
+        return
+
+    forest, X_train = _fitted_forest(seed=3)
+    X = _test_rows(X_train)[:100]
+    reference = shap.TreeExplainer(forest)
+    flat = shap.TreeExplainer(FlatForest.from_forest(forest).tree_explainer_model())
+    np.testing.assert_allclose(flat.shap_values(X), reference.shap_values(X), rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(
+        np.ravel(flat.expected_value), np.ravel(reference.expected_value), rtol=1e-6, atol=1e-8
+    )
+
+
+def main():
+    test_predict_matches_sklearn()
+    test_chunked_predict_matches_sklearn()
+    test_shared_predict_matches_sklearn()
+    test_shap_values_match_sklearn()
+    print("FlatForest matches RandomForestRegressor.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Checks that ProfileIndex keeps its term count and skill matrices up to date
+after upserts and removals by patching only the changed rows, and that
+matrices handed out earlier are never modified.
+
+Run with `python -m pytest src/test_profile_index.py` or `python src/test_profile_index.py`.
+"""
+import random
+
+import numpy as np
+
+from models.profile_index import ProfileIndex
+from models.skill_taxonomy import SkillTaxonomy
+
+SKILLS = ['Python', 'SQL', 'Java', 'Docker', 'Kubernetes', 'AWS', 'Rust', 'Go', 'Elixir', 'k8s']
+
+
+class TermProcessor:
+    """Stands in for MixedDataProcessor: terms are the lower-cased skills"""
+
+    def skill_terms(self, skills):
+        return [skill.lower() for skill in skills]
+
+
+class CountingTaxonomy(SkillTaxonomy):
+    """Counts the skill lists it is asked to map"""
+
+    def __init__(self, skills):
+        super().__init__(skills)
+        self.mapped = 0
+
+    def to_ids(self, skills, extension=None):
+        self.mapped += 1
+        return super().to_ids(skills, extension)
+
+
+def _upsert(index, profile_id, skills):
+    index.upsert_features(profile_id, {'years_experience': 1.0}, skills, np.ones(4))
+
+
+def _term_counts(index, matrix):
+    """Each row of a term count matrix as {term: count}"""
+    terms = {term_id: term for term, term_id in index.vocabulary.items()}
+    return [
+        {terms[term_id]: count for term_id, count in zip(row.indices, row.data)}
+        for row in map(matrix.getrow, range(matrix.shape[0]))
+    ]
+
+
+def _expected_terms(index, profile_id):
+    counts = {}
+    for term in index.processor.skill_terms(index.get_features(profile_id)[1]):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+def _skill_names(taxonomy, matrix, extension):
+    """Each row of a skill matrix as a set of normalized names"""
+    names = list(taxonomy.names) + sorted(extension, key=extension.get)
+    return [{names[skill_id] for skill_id in matrix.getrow(row).indices} for row in range(matrix.shape[0])]
+
+
+def _expected_skills(taxonomy, index, profile_id):
+    return {taxonomy.normalize(skill) for skill in index.get_features(profile_id)[1]} - {''}
+
+
+def test_random_edits_match_a_rebuilt_index():
+    rng = random.Random(0)
+    taxonomy = SkillTaxonomy(SKILLS[:6])
+    index = ProfileIndex(TermProcessor(), capacity=8)
+    snapshots = []
+    for step in range(400):
+        profile_id = f"P{rng.randint(0, 60)}"
+        if rng.random() < 0.3:
+            index.remove(profile_id)
+        else:
+            _upsert(index, profile_id, [rng.choice(SKILLS) for _ in range(rng.randint(0, 4))])
+        if rng.random() < 0.2:
+            terms = index.term_counts()
+            skills, extension = index.skill_matrix(taxonomy)
+            snapshots.append((terms, terms.toarray(), skills, skills.toarray()))
+
+            ids = index.ids
+            assert terms.shape[0] == skills.shape[0] == len(ids)
+            assert _term_counts(index, terms) == [_expected_terms(index, profile_id) for profile_id in ids]
+            assert _skill_names(taxonomy, skills, extension) == [
+                _expected_skills(taxonomy, index, profile_id) for profile_id in ids
+            ]
+
+    # Later patches went to new buffers or past the end of earlier matrices
+    for terms, terms_copy, skills, skills_copy in snapshots:
+        np.testing.assert_array_equal(terms.toarray(), terms_copy)
+        np.testing.assert_array_equal(skills.toarray(), skills_copy)
+
+
+def test_only_changed_rows_are_mapped_again():
+    taxonomy = CountingTaxonomy(SKILLS[:6])
+    index = ProfileIndex(TermProcessor())
+    for row in range(50):
+        _upsert(index, f"P{row}", [SKILLS[row % len(SKILLS)]])
+    index.skill_matrix(taxonomy)
+    assert taxonomy.mapped == 50
+
+    _upsert(index, 'P7', ['Rust', 'SQL'])
+    _upsert(index, 'P50', ['Go'])
+    index.remove('P10')
+    matrix, extension = index.skill_matrix(taxonomy)
+    # P7, and P50 once: it was first needed in the slot P10 left
+    assert taxonomy.mapped == 52
+    assert matrix.shape[0] == 50
+    assert _skill_names(taxonomy, matrix, extension)[index.ids.index('P7')] == {'rust', 'sql'}
+
+    # Nothing changed: the matrix is returned as it is
+    index.skill_matrix(taxonomy)
+    assert taxonomy.mapped == 52
+
+    # A different model's taxonomy maps every row again
+    other = CountingTaxonomy(SKILLS)
+    index.skill_matrix(other)
+    assert other.mapped == 50
+
+
+def test_removing_every_row_and_refilling():
+    index = ProfileIndex(TermProcessor())
+    for row in range(5):
+        _upsert(index, f"P{row}", ['Python', 'SQL'])
+    assert index.term_counts().nnz == 10
+    for row in range(5):
+        index.remove(f"P{row}")
+    assert index.term_counts().shape[0] == 0
+    _upsert(index, 'P9', ['Go', 'Go'])
+    assert _term_counts(index, index.term_counts()) == [{'go': 2.0}]
+
+
+def main():
+    test_random_edits_match_a_rebuilt_index()
+    test_only_changed_rows_are_mapped_again()
+    test_removing_every_row_and_refilling()
+    print("ProfileIndex patches its sparse matrices row by row.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Checks the skill overlap kernels against plain set arithmetic, and that a
+trained taxonomy is never changed by the skills of incoming profiles.
+
+Run with `python -m pytest src/test_skill_taxonomy.py` or `python src/test_skill_taxonomy.py`.
+"""
+import random
+
+import numpy as np
+
+from models.skill_taxonomy import (
+    SkillTaxonomy, SkillWeights, skill_overlap_features, skill_overlap_one_to_many
+)
+
+TRAINING_SKILLS = ['Python', 'SQL', 'Java', 'JavaScript', 'Docker', 'Kubernetes', 'AWS', 'React']
+UNSEEN_SKILLS = ['Rust', 'Go', 'Elixir', 'Haskell']
+
+
+def _skill_lists(n_lists, seed=0):
+    rng = random.Random(seed)
+    pool = TRAINING_SKILLS + UNSEEN_SKILLS + ['k8s', 'js', ' python. ']
+    return [[rng.choice(pool) for _ in range(rng.randint(0, 5))] for _ in range(n_lists)]
+
+
+def _weight(names, weights):
+    return sum(
+        np.log((1 + weights.n_documents) / (1 + weights.document_frequency.get(name, 0))) + 1
+        for name in names
+    )
+
+
+def _reference(candidate_skills, job_skills, taxonomy, weights):
+    """Skill features from Python sets of normalized names"""
+    candidate = {taxonomy.normalize(skill) for skill in candidate_skills} - {''}
+    job = {taxonomy.normalize(skill) for skill in job_skills} - {''}
+    shared = candidate & job
+    return {
+        'skill_overlap': len(shared) / len(job) if job else 0.0,
+        'skill_jaccard': len(shared) / len(candidate | job) if candidate | job else 0.0,
+        'skill_weighted_coverage': _weight(shared, weights) / _weight(job, weights) if job else 0.0,
+    }
+
+
+def _fitted():
+    training = [TRAINING_SKILLS] + [
+        [skill for skill in skills if skill not in UNSEEN_SKILLS] for skills in _skill_lists(50, seed=1)
+    ]
+    taxonomy = SkillTaxonomy(skill for skills in training for skill in skills)
+    return taxonomy, SkillWeights().fit(training, taxonomy)
+
+
+def test_unknown_skills_do_not_grow_the_taxonomy():
+    taxonomy, _ = _fitted()
+    names = list(taxonomy.names)
+    extension = {}
+    ids = taxonomy.to_ids(['Rust', 'python', 'Go', 'rust'], extension)
+    assert taxonomy.names == names
+    assert set(extension) == {'rust', 'go'}
+    assert sorted(extension.values()) == [len(taxonomy), len(taxonomy) + 1]
+    assert len(ids) == 3 and taxonomy.ids['python'] in ids
+    # Without a shared extension every call starts from the end of the taxonomy again
+    assert taxonomy.to_ids(['Elixir'])[0] == len(taxonomy)
+
+
+def test_weight_vector_is_reused_and_padded():
+    taxonomy, weights = _fitted()
+    base = weights.vector(taxonomy)
+    assert weights.vector(taxonomy, len(taxonomy)) is base
+    padded = weights.vector(taxonomy, len(taxonomy) + 3)
+    np.testing.assert_array_equal(padded[:len(taxonomy)], base)
+    np.testing.assert_allclose(padded[len(taxonomy):], weights.unseen_weight)
+    assert weights.vector(taxonomy) is base
+
+
+def test_pairwise_features_match_sets():
+    taxonomy, weights = _fitted()
+    candidates, jobs = _skill_lists(200, seed=2), _skill_lists(200, seed=3)
+    extension = {}
+    id_lists = [taxonomy.to_ids(skills, extension) for skills in candidates + jobs]
+    matrix = taxonomy.matrix(id_lists, len(taxonomy) + len(extension))
+    features = skill_overlap_features(
+        matrix[:len(candidates)], matrix[len(candidates):], weights.vector(taxonomy, matrix.shape[1])
+    )
+    for row, (candidate_skills, job_skills) in enumerate(zip(candidates, jobs)):
+        for name, value in _reference(candidate_skills, job_skills, taxonomy, weights).items():
+            assert abs(features[name][row] - value) < 1e-9, (name, candidate_skills, job_skills)
+
+
+def test_one_to_many_matches_pairwise():
+    taxonomy, weights = _fitted()
+    profiles = _skill_lists(100, seed=4)
+    extension = {}
+    profile_matrix = taxonomy.matrix(
+        [taxonomy.to_ids(skills, extension) for skills in profiles], len(taxonomy) + len(extension)
+    )
+    index_extension = dict(extension)
+    for query_is_job in (True, False):
+        for query in _skill_lists(10, seed=5):
+            query_extension = dict(extension)
+            query_ids = taxonomy.to_ids(query, query_extension)
+            vector = weights.vector(taxonomy, len(taxonomy) + len(query_extension))
+            features = skill_overlap_one_to_many(query_ids, profile_matrix, vector, query_is_job=query_is_job)
+            for row, profile in enumerate(profiles):
+                candidate_skills, job_skills = (profile, query) if query_is_job else (query, profile)
+                for name, value in _reference(candidate_skills, job_skills, taxonomy, weights).items():
+                    assert abs(features[name][row] - value) < 1e-9, (name, query, profile)
+    # Each query's unknown skills stayed in its own copy of the extension
+    assert extension == index_extension
+
+
+def main():
+    test_unknown_skills_do_not_grow_the_taxonomy()
+    test_weight_vector_is_reused_and_padded()
+    test_pairwise_features_match_sets()
+    test_one_to_many_matches_pairwise()
+    print("Skill taxonomy and overlap kernels match set arithmetic.")
+
+
+if __name__ == "__main__":
+    main()
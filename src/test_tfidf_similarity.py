@@ -0,0 +1,82 @@
+"""Checks that the vectorized pairwise TF-IDF similarity matches fitting a
+TfidfVectorizer on each (candidate, job) pair, as the matcher originally did.
+
+Run with `python -m pytest src/test_tfidf_similarity.py` or `python src/test_tfidf_similarity.py`.
+"""
+import random
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from models.hybrid_matcher import HybridMatcher, MixedDataProcessor
+
+SKILL_POOL = [
+    'Python', 'SQL', 'Java', 'JavaScript', 'Docker', 'Kubernetes', 'AWS', 'React',
+    'machine learning', 'deep learning', 'data analysis', 'project management',
+    'Go', 'Rust', 'TensorFlow', 'PyTorch', 'PostgreSQL', 'REST APIs', 'Git',
+]
+
+
+def _matcher() -> HybridMatcher:
+    # Only the TF-IDF tokenizer is needed, so skip loading the spaCy and
+    # SentenceTransformer models
+    processor = MixedDataProcessor.__new__(MixedDataProcessor)
+    processor.tfidf_vectorizer = TfidfVectorizer(max_features=1000)
+    matcher = HybridMatcher.__new__(HybridMatcher)
+    matcher.processor = processor
+    return matcher
+
+
+def _reference_similarity(candidate_skills, job_skills) -> float:
+    """The original implementation: fit TF-IDF on the pair and take the cosine"""
+    candidate_text, job_text = ' '.join(candidate_skills), ' '.join(job_skills)
+    if not candidate_text or not job_text:
+        return 0.0
+    vectors = TfidfVectorizer(max_features=1000).fit_transform([candidate_text, job_text])
+    return cosine_similarity(vectors[0:1], vectors[1:2])[0][0]
+
+
+def _pairs(n_pairs=300, seed=0):
+    rng = random.Random(seed)
+    pairs = [
+        (['Python', 'SQL'], ['Python', 'SQL']),
+        (['Python'], ['Java']),
+        ([], ['Python']),
+        (['machine learning', 'deep learning'], ['learning']),
+        (['Python', 'Python', 'SQL'], ['python']),
+    ]
+    for _ in range(n_pairs):
+        pairs.append((
+            [rng.choice(SKILL_POOL) for _ in range(rng.randint(0, 6))],
+            [rng.choice(SKILL_POOL) for _ in range(rng.randint(1, 6))],
+        ))
+    return pairs
+
+
+def test_batch_matches_per_pair_vectorizer():
+    matcher = _matcher()
+    pairs = _pairs()
+    n_pairs = len(pairs)
+    term_counts = matcher._skill_term_matrix([c for c, _ in pairs] + [j for _, j in pairs])
+    batch = matcher._calculate_tfidf_similarity_batch(term_counts[:n_pairs], term_counts[n_pairs:])
+    expected = np.array([_reference_similarity(c, j) for c, j in pairs])
+    np.testing.assert_allclose(batch, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_single_pair_matches_per_pair_vectorizer():
+    matcher = _matcher()
+    for candidate_skills, job_skills in _pairs(n_pairs=50, seed=1):
+        similarity = matcher._calculate_tfidf_similarity({'skills': candidate_skills}, {'skills': job_skills})
+        expected = _reference_similarity(candidate_skills, job_skills)
+        assert abs(similarity - expected) < 1e-9, (candidate_skills, job_skills, similarity, expected)
+
+
+def main():
+    test_batch_matches_per_pair_vectorizer()
+    test_single_pair_matches_per_pair_vectorizer()
+    print("TF-IDF similarity matches the per-pair vectorizer.")
+
+
+if __name__ == "__main__":
+    main()
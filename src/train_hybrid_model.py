@@ -1,4 +1,11 @@
 from models.hybrid_matcher import HybridMatcher
+from models.pipeline import StagedPipeline, benchmark_pipeline, parse_concurrency
+from models.skill_taxonomy import SkillTaxonomy, skill_overlap_one_to_many
+import argparse
+import joblib
+import json
+import os
+import time
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
@@ -6,13 +13,26 @@ from sklearn.metrics import mean_squared_error, r2_score
 
 # Constants
 EDUCATION_LEVELS = ['High School', 'Bachelor', 'Master', 'PhD']
+MODEL_PATH = 'hybrid_model.joblib'
+# Held-out pairs of the last training run, evaluated by --evaluate-only
+VALIDATION_PATH = 'hybrid_model.validation.joblib'
 
-def generate_training_data():
-    """Generate training data from CSV files with calculated match scores."""
+def generate_training_data(seed=42):
+    """Generate training data from CSV files with calculated match scores.
+    
+    Candidates are sampled with `seed`, so the same CSV files always give the
+    same pairs.
+    """
+    rng = np.random.RandomState(seed)
     print("Loading generated data...")
     candidates_df = pd.read_csv('src/data/sample_candidates.csv')
     jobs_df = pd.read_csv('src/data/sample_jobs.csv')
     
+    # Candidate skills as a binary matrix over taxonomy IDs, built once
+    candidate_skill_lists = [eval(skills) for skills in candidates_df['tech_skills']]
+    taxonomy = SkillTaxonomy(skill for skills in candidate_skill_lists for skill in skills)
+    candidate_skills = taxonomy.matrix([taxonomy.to_ids(skills) for skills in candidate_skill_lists])
+    
     training_data = []
     
     # For each job, find matching candidates
@@ -36,7 +56,16 @@ def generate_training_data():
         }
         
         # Sample 5 random candidates for each job
-        for _, candidate in candidates_df.sample(n=min(5, len(candidates_df))).iterrows():
+        sampled = candidates_df.sample(n=min(5, len(candidates_df)), random_state=rng)
+        
+        # Skill overlap of the job with all sampled candidates at once; skills no
+        # candidate has get IDs past the candidate columns and never match
+        required_skills = taxonomy.to_ids(eval(job['required_tech_skills']))
+        skill_matches = skill_overlap_one_to_many(
+            required_skills, candidate_skills[candidates_df.index.get_indexer(sampled.index)]
+        )['skill_overlap']
+        
+        for (_, candidate), skill_match in zip(sampled.iterrows(), skill_matches):
             candidate_dict = {
                 'structured': {
                     'years_experience': candidate['years_experience'],
@@ -61,11 +90,6 @@ def generate_training_data():
             loc_match = 1.0 if job['location'] in eval(candidate['preferred_locations']) else 0.0
             work_match = 1.0 if candidate['work_preference'] == job['work_arrangement'] else 0.5
             
-            # Calculate skill overlap
-            candidate_skills = set(eval(candidate['tech_skills']))
-            required_skills = set(eval(job['required_tech_skills']))
-            skill_match = len(candidate_skills.intersection(required_skills)) / len(required_skills) if required_skills else 0.0
-            
             # Combine all factors for final score
             match_score = np.mean([exp_match, edu_match, loc_match, work_match, skill_match])
             
@@ -77,53 +101,203 @@ def generate_training_data():
     
     return training_data
 
-def evaluate_model(matcher, validation_data):
-    """Evaluate model performance on validation data."""
-    true_scores = []
-    pred_scores = []
-    
-    for sample in validation_data:
-        true_score = sample['match_score']
-        pred_score, _ = matcher.predict_score(sample['candidate'], sample['job'])
+def ranking_metrics(true_scores, pred_scores, groups, k=5, relevance_threshold=0.7):
+    """Average NDCG@k, recall@k and precision@k over the candidates ranked for each job.
+    
+    True match scores are used as graded relevance for NDCG; a candidate counts
+    as relevant for recall/precision when its true score reaches
+    `relevance_threshold`. Precision is taken over min(k, candidates for the job)
+    so jobs with fewer than k candidates are not penalised.
+    """
+    true_scores = np.asarray(true_scores, dtype=np.float64)
+    pred_scores = np.asarray(pred_scores, dtype=np.float64)
+    groups = np.asarray(groups)
+    
+    ndcgs, recalls, precisions = [], [], []
+    order = np.argsort(groups, kind='stable')
+    boundaries = np.flatnonzero(np.diff(groups[order])) + 1
+    for rows in np.split(order, boundaries):
+        if len(rows) < 2:
+            continue
+        relevance = true_scores[rows]
+        ranked = relevance[np.argsort(-pred_scores[rows], kind='stable')][:k]
+        ideal = np.sort(relevance)[::-1][:k]
+        discounts = 1.0 / np.log2(np.arange(2, len(ranked) + 2))
+        ideal_dcg = ideal @ discounts
+        if ideal_dcg > 0:
+            ndcgs.append((ranked @ discounts) / ideal_dcg)
         
-        true_scores.append(true_score)
-        pred_scores.append(pred_score)
+        relevant = relevance >= relevance_threshold
+        hits = np.count_nonzero(ranked >= relevance_threshold)
+        precisions.append(hits / len(ranked))
+        if relevant.any():
+            recalls.append(hits / np.count_nonzero(relevant))
+    
+    def _mean(values):
+        return float(np.mean(values)) if values else float('nan')
+    
+    return {
+        f'ndcg@{k}': _mean(ndcgs),
+        f'recall@{k}': _mean(recalls),
+        f'precision@{k}': _mean(precisions),
+        'ranked_jobs': len(precisions)
+    }
+
+def evaluate_model(matcher, validation_data, k=5, relevance_threshold=0.7, chunk_size=10000, batch_size=256, n_process=1,
+                   pipeline=None):
+    """Evaluate model performance on validation data.
     
+    Features are prepared in chunks of `chunk_size` pairs (each distinct text is
+    processed once per chunk) and scored with a single forest call per chunk,
+    without SHAP explanations. Reports regression metrics, ranking metrics per
+    job and the time spent in each stage. With a `StagedPipeline` the chunks
+    are parsed, encoded and scored concurrently, and its per-stage utilization
+    is reported instead.
+    """
+    timings = {}
+    true_scores = np.array([sample['match_score'] for sample in validation_data], dtype=np.float64)
+    pred_scores = np.empty(len(validation_data), dtype=np.float64)
+    
+    chunks = [
+        ([sample['candidate'] for sample in validation_data[offset:offset + chunk_size]],
+         [sample['job'] for sample in validation_data[offset:offset + chunk_size]])
+        for offset in range(0, len(validation_data), chunk_size)
+    ]
+    pipeline_stats = None
+    if pipeline is not None:
+        pred_scores[:], pipeline_stats = pipeline.run(matcher, chunks)
+        timings['pipeline'] = pipeline_stats['seconds']
+    else:
+        offset = 0
+        for candidates, jobs in chunks:
+            features = matcher.prepare_features_batch(
+                candidates, jobs, batch_size=batch_size, timings=timings, n_process=n_process
+            )
+            start = time.perf_counter()
+            pred_scores[offset:offset + len(candidates)] = matcher.predict_features(features)
+            timings['prediction'] = timings.get('prediction', 0.0) + time.perf_counter() - start
+            offset += len(candidates)
+    
+    start = time.perf_counter()
     mse = mean_squared_error(true_scores, pred_scores)
     r2 = r2_score(true_scores, pred_scores)
+    # Pairs for the same job posting form one ranking
+    groups = [json.dumps(sample['job'], sort_keys=True, default=str) for sample in validation_data]
+    metrics = {'mse': float(mse), 'r2': float(r2)}
+    metrics.update(ranking_metrics(true_scores, pred_scores, groups, k=k, relevance_threshold=relevance_threshold))
+    timings['metrics'] = time.perf_counter() - start
+    metrics['timings'] = timings
     
     print("\nValidation Metrics:")
     print(f"Mean Squared Error: {mse:.4f}")
     print(f"R² Score: {r2:.4f}")
+    print(f"NDCG@{k}: {metrics[f'ndcg@{k}']:.4f}")
+    print(f"Recall@{k}: {metrics[f'recall@{k}']:.4f}")
+    print(f"Precision@{k}: {metrics[f'precision@{k}']:.4f}")
+    print(f"Jobs ranked: {metrics['ranked_jobs']}")
+    
+    total = sum(timings.values())
+    print(f"\nEvaluation timings ({len(validation_data)} pairs, {total:.2f}s total):")
+    for stage, seconds in timings.items():
+        print(f"  {stage}: {seconds:.3f}s")
+    if pipeline_stats is not None:
+        metrics['pipeline'] = pipeline_stats
+        print_pipeline_stats(pipeline_stats)
     
-    return mse, r2
+    return metrics
+
+def print_pipeline_stats(stats):
+    print(f"Pipeline: {stats['pairs']} pairs in {stats['seconds']:.2f}s ({stats['pairs_per_second']:.1f} pairs/s)")
+    for stage, stage_stats in stats['stages'].items():
+        print(f"  {stage}: {stage_stats['workers']} worker(s), {stage_stats['chunks']} chunks, "
+              f"busy {stage_stats['busy_seconds']:.3f}s, utilization {stage_stats['utilization']:.0%}")
 
 def main():
-    print("Initializing Hybrid Matcher...")
-    matcher = HybridMatcher()
+    parser = argparse.ArgumentParser(description="Train and evaluate the hybrid matcher")
+    parser.add_argument('--evaluate-only', action='store_true',
+                        help="Evaluate the saved hybrid_model.joblib instead of training")
+    parser.add_argument('--k', type=int, default=5, help="Cutoff for ranking metrics")
+    parser.add_argument('--relevance-threshold', type=float, default=0.7,
+                        help="Match score at which a candidate counts as relevant")
+    parser.add_argument('--n-process', type=int, default=1,
+                        help="spaCy worker processes for skill extraction (not used by --pipeline, "
+                             "which scales parsing with --pipeline-concurrency parse=N)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Evaluate with the staged parse/encode/score pipeline")
+    parser.add_argument('--pipeline-concurrency', default='',
+                        help="Workers per pipeline stage, e.g. parse=2,encode=1,score=1")
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help="Pairs per pipeline chunk")
+    parser.add_argument('--benchmark-pipeline', action='store_true',
+                        help="Compare the pipeline with sequential scoring on the validation set")
+    parser.add_argument('--benchmark-repeats', type=int, default=3,
+                        help="Alternating rounds of each side in --benchmark-pipeline")
+    args = parser.parse_args()
     
-    print("Generating training data...")
-    all_data = generate_training_data()
+    print("Initializing Hybrid Matcher...")
+    matcher = HybridMatcher.load(MODEL_PATH) if args.evaluate_only else HybridMatcher()
     
-    # Split data into training and validation sets
-    train_data, val_data = train_test_split(
-        all_data, 
-        test_size=0.2,
-        random_state=42
-    )
+    if args.evaluate_only and os.path.exists(VALIDATION_PATH):
+        # Evaluate on exactly the pairs the model was not trained on
+        print(f"Loading held-out validation data from {VALIDATION_PATH}...")
+        train_data, val_data = [], joblib.load(VALIDATION_PATH)
+    else:
+        if args.evaluate_only:
+            print(f"Warning: {VALIDATION_PATH} not found; regenerating the split, which only "
+                  "matches the model's held-out pairs if the CSV files are unchanged")
+        print("Generating training data...")
+        all_data = generate_training_data()
+        
+        # Split data into training and validation sets
+        train_data, val_data = train_test_split(
+            all_data, 
+            test_size=0.2,
+            random_state=42
+        )
     
     print(f"\nDataset sizes:")
     print(f"Training samples: {len(train_data)}")
     print(f"Validation samples: {len(val_data)}")
     
-    print("\nTraining model...")
-    matcher.train(train_data)
+    pipeline_options = {
+        'concurrency': parse_concurrency(args.pipeline_concurrency),
+        'batch_size': 256
+    }
+    pipeline = StagedPipeline(**pipeline_options) if args.pipeline else None
+    chunk_size = args.chunk_size if args.pipeline else 10000
+    
+    if not args.evaluate_only:
+        print("\nTraining model...")
+        matcher.train(train_data, n_process=args.n_process)
     
     print("\nEvaluating model...")
-    evaluate_model(matcher, val_data)
+    evaluate_model(matcher, val_data, k=args.k, relevance_threshold=args.relevance_threshold,
+                   chunk_size=chunk_size, n_process=args.n_process, pipeline=pipeline)
+    
+    if args.benchmark_pipeline:
+        print("\nBenchmarking pipeline against sequential scoring...")
+        result = benchmark_pipeline(
+            matcher,
+            [sample['candidate'] for sample in val_data],
+            [sample['job'] for sample in val_data],
+            chunk_size=args.chunk_size,
+            repeats=args.benchmark_repeats,
+            **pipeline_options
+        )
+        sequential = result['sequential']
+        print(f"Median of {result['repeats']} alternating rounds after a warm-up chunk")
+        print(f"Sequential: {sequential['seconds']:.2f}s ({sequential['pairs_per_second']:.1f} pairs/s), "
+              f"rounds {', '.join(f'{seconds:.2f}s' for seconds in sequential['rounds'])}")
+        print_pipeline_stats(result['pipelined'])
+        print(f"  rounds {', '.join(f'{seconds:.2f}s' for seconds in result['pipelined']['rounds'])}")
+        print(f"Speedup: {result['speedup']:.2f}x")
+    
+    if args.evaluate_only:
+        return
     
     print("\nSaving model...")
-    matcher.save('hybrid_model.joblib')
+    matcher.save(MODEL_PATH)
+    joblib.dump(val_data, VALIDATION_PATH)
     
     print("Training complete!")
 
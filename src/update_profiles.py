@@ -0,0 +1,53 @@
+from models.hybrid_matcher import MixedDataProcessor
+from models.change_feed import ProfileChangeFeed, iter_jsonl_events, load_or_create_index
+import argparse
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply profile change events to the candidate and job indexes")
+    parser.add_argument('events', help="JSONL file of upsert/delete events")
+    parser.add_argument('--follow', action='store_true', help="Keep tailing the events file")
+    parser.add_argument('--job-index', default='job_index.joblib')
+    parser.add_argument('--candidate-index', default='candidate_index.joblib')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--save-interval', type=float, default=30.0,
+                        help="Seconds between index saves while following")
+    args = parser.parse_args()
+
+    print("Loading NLP models...")
+    processor = MixedDataProcessor()
+    paths = {'job': args.job_index, 'candidate': args.candidate_index}
+    indexes = {kind: load_or_create_index(path, processor) for kind, path in paths.items()}
+    feed = ProfileChangeFeed(processor, indexes, batch_size=args.batch_size)
+
+    last_save = time.monotonic()
+
+    def save_indexes():
+        for kind, index in indexes.items():
+            if index.dirty:
+                index.save(paths[kind])
+
+    def save_if_due():
+        # Also called while the feed is idle, so the last edits before a quiet
+        # period are saved (and seen by watching APIs) within one interval
+        nonlocal last_save
+        if args.follow and time.monotonic() - last_save >= args.save_interval:
+            save_indexes()
+            last_save = time.monotonic()
+
+    def on_flush(stats):
+        print(f"Applied batch {stats['batches']}: {stats}")
+        save_if_due()
+
+    try:
+        feed.apply(iter_jsonl_events(args.events, follow=args.follow), on_flush=on_flush, on_idle=save_if_due)
+    except KeyboardInterrupt:
+        print("Interrupted, saving indexes...")
+
+    save_indexes()
+    print(f"Done: {feed.stats}")
+    for kind, index in indexes.items():
+        print(f"  {kind} index: {len(index)} profiles")
+
+if __name__ == "__main__":
+    main()